@@ -0,0 +1,146 @@
+"""
+Compares regex based prefix separation with PrefixMatcher.
+
+Corpus is a JSON lines file with content and guild_id (null for DMs) keys. If
+it is not given, synthetic corpus with mostly regular chat messages is used.
+
+Usage: python benchmarks/dispatch.py [corpus.jsonl]
+"""
+
+import os
+import re
+import sys
+import json
+import random
+
+from time import perf_counter
+from typing import List, Tuple, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tarakania_rpg"))
+
+from handler.prefixes import PrefixMatcher  # noqa: E402
+
+BOT_ID = 123456789012345678
+DEFAULT_PREFIX = "t!"
+CUSTOM_PREFIX_GUILD = 2
+COMMANDS = {"help": None, "ping": None, "profile": None, "inventory": None}
+CORPUS_SIZE = 100_000
+REPEATS = 5
+
+PREFIX_REGEX = r"^(?P<prefix>({prefixes}))\s*(?P<command>\w+)(?:\s+(?P<arguments>.+))?$"
+
+Message = Tuple[str, Optional[int]]
+
+
+def synthetic_corpus(size: int) -> List[Message]:
+    rng = random.Random(0)
+    words = ["привет", "как", "дела", "lol", "ok", "<:emoji:1>", "tak", "!!"]
+    commands = [
+        f"{DEFAULT_PREFIX}ping",
+        f"{DEFAULT_PREFIX}profile <@{BOT_ID}>",
+        f"<@!{BOT_ID}> help inventory",
+        "t!unknown command",
+        f"{DEFAULT_PREFIX}sql SELECT *\nFROM players\nWHERE xp > 100" * 20,
+    ]
+
+    corpus: List[Message] = []
+    for _ in range(size):
+        guild_id = rng.choice((None, 1, 1, 1, CUSTOM_PREFIX_GUILD))
+        if rng.random() < 0.05:
+            content = rng.choice(commands)
+        elif rng.random() < 0.1:
+            # code blocks and other long multiline messages
+            content = "\n".join(
+                " ".join(rng.choices(words, k=10)) for _ in range(rng.randint(5, 30))
+            )
+        else:
+            content = " ".join(rng.choices(words, k=rng.randint(1, 20)))
+
+        corpus.append((content, guild_id))
+
+    return corpus
+
+
+def read_corpus(path: str) -> List[Message]:
+    with open(path) as f:
+        return [
+            (message["content"], message["guild_id"])
+            for message in map(json.loads, f)
+        ]
+
+
+def make_regex_dispatcher():  # type: ignore
+    prefixes = (re.escape(DEFAULT_PREFIX), fr"<@{BOT_ID}>", fr"<@!{BOT_ID}>")
+    flags = re.IGNORECASE | re.UNICODE
+    regex = re.compile(PREFIX_REGEX.format(prefixes="|".join(prefixes)), flags)
+    dm_regex = re.compile(
+        PREFIX_REGEX.format(prefixes="|".join(prefixes + ("",))), flags
+    )
+    custom_prefixes = {CUSTOM_PREFIX_GUILD: "!"}
+
+    def dispatch(content: str, guild_id: Optional[int]) -> object:
+        if guild_id is None:
+            match = dm_regex.search(content)
+        else:
+            custom_prefix = custom_prefixes.get(guild_id)
+            if custom_prefix is not None:
+                if not content.lower().startswith(custom_prefix):
+                    return None
+
+                parts = content[len(custom_prefix) :].split(maxsplit=1)
+                return COMMANDS.get(parts[0].lower()) if parts else None
+
+            match = regex.search(content)
+
+        if match is None:
+            return None
+
+        return COMMANDS.get(match.group("command").lower())
+
+    return dispatch
+
+
+def make_matcher_dispatcher():  # type: ignore
+    matcher = PrefixMatcher(DEFAULT_PREFIX, BOT_ID)
+    matcher.set_custom_prefix(CUSTOM_PREFIX_GUILD, "!")
+
+    def dispatch(content: str, guild_id: Optional[int]) -> object:
+        prefix, command, arguments = matcher.split(content, guild_id)
+        if command is None:
+            return None
+
+        return COMMANDS.get(command.lower())
+
+    return dispatch
+
+
+def measure(dispatch, corpus: List[Message]) -> float:  # type: ignore
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = perf_counter()
+        for content, guild_id in corpus:
+            dispatch(content, guild_id)
+
+        best = min(best, perf_counter() - start)
+
+    return len(corpus) / best
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        corpus = read_corpus(sys.argv[1])
+    else:
+        corpus = synthetic_corpus(CORPUS_SIZE)
+
+    print(f"{len(corpus)} messages")
+
+    for name, make_dispatcher in (
+        ("regex", make_regex_dispatcher),
+        ("matcher", make_matcher_dispatcher),
+    ):
+        rate = measure(make_dispatcher(), corpus)
+        print(f"{name:>8}: {rate:12,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compares full TabularData rendering with page by page TableRenderer on a large
+table.
+
+Usage: python benchmarks/formatting.py [rows]
+"""
+
+import os
+import sys
+import random
+
+from time import perf_counter
+from typing import Any, List
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tarakania_rpg"))
+
+from utils.formatting import (  # noqa: E402
+    MESSAGE_LENGTH,
+    TabularData,
+    TableRenderer,
+    codeblock,
+)
+
+COLUMNS = ["discord_id", "nick", "race", "class", "xp", "money"]
+ROWS = 10_000
+REPEATS = 5
+
+# old sql command page size
+CHUNK_SIZE = 1500
+
+
+def make_rows(count: int) -> List[List[Any]]:
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyzабвгдежзийклмнопрстуфхцчшщэюя"
+
+    return [
+        [
+            rng.randrange(10 ** 17, 10 ** 18),
+            "".join(rng.choice(letters) for _ in range(rng.randrange(3, 30))),
+            rng.randrange(7),
+            rng.randrange(5),
+            rng.randrange(10 ** 7),
+            rng.randrange(10 ** 5),
+        ]
+        for _ in range(count)
+    ]
+
+
+def tabular_data(rows: List[List[Any]]) -> List[str]:
+    table = TabularData()
+    table.set_columns(COLUMNS)
+    table.add_rows(rows)
+    result = table.render()
+
+    return [result[i : i + CHUNK_SIZE] for i in range(0, len(result), CHUNK_SIZE)]
+
+
+def renderer_pages(rows: List[List[Any]]) -> List[str]:
+    renderer = TableRenderer.from_sample(COLUMNS, rows)
+
+    return list(renderer.pages(rows))
+
+
+def renderer_first_page(rows: List[List[Any]]) -> List[str]:
+    renderer = TableRenderer.from_sample(COLUMNS, rows)
+
+    return list(islice(renderer.pages(rows), 1))
+
+
+def measure(fn: Any, rows: List[List[Any]]) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = perf_counter()
+        fn(rows)
+        best = min(best, perf_counter() - start)
+
+    return best
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rows = make_rows(count)
+
+    pages = renderer_pages(rows)
+    assert all(len(codeblock(p)) <= MESSAGE_LENGTH for p in pages)
+    # every page starts and ends with separator, rows are never split
+    assert all(p.startswith("+") and p.endswith("+") for p in pages)
+    assert sum(p.count("\n") - 3 for p in pages) == count
+
+    chunks = tabular_data(rows)
+    split_rows = sum(not c.endswith("\n") and not c.endswith("+") for c in chunks)
+
+    print(f"{count} rows")
+    print(
+        f"TabularData + slicing: {measure(tabular_data, rows) * 1000:8.2f}ms, "
+        f"{len(chunks)} pages, {split_rows} split rows"
+    )
+    print(
+        f"TableRenderer pages:   {measure(renderer_pages, rows) * 1000:8.2f}ms, "
+        f"{len(pages)} pages, 0 split rows"
+    )
+    print(f"TableRenderer 1 page:  {measure(renderer_first_page, rows) * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
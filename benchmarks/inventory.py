@@ -0,0 +1,56 @@
+"""
+Compares list based inventory with counted PlayerInventory.
+
+Usage: python benchmarks/inventory.py
+"""
+
+import os
+import sys
+
+from timeit import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tarakania_rpg"))
+
+from rpg import load_objects  # noqa: E402
+from rpg.items import Item  # noqa: E402
+from rpg.player import PlayerInventory  # noqa: E402
+
+UNIT_COUNTS = (10, 1_000, 100_000)
+REPEATS = 1000
+
+
+def main() -> None:
+    load_objects()
+
+    item_ids = [i.id for i in Item.all_instances()]
+    item = Item.from_id(item_ids[-1])
+
+    for units in UNIT_COUNTS:
+        ids = [item_ids[i % len(item_ids)] for i in range(units)]
+
+        items_list = [Item.from_id(i) for i in ids]
+        inventory = PlayerInventory(items=ids)
+
+        def list_ops() -> None:
+            item in items_list
+            items_list.count(item)
+            items_list.append(item)
+            items_list.remove(item)
+
+        def counted_ops() -> None:
+            item in inventory
+            inventory.get_count(item)
+            inventory._add(item.id)
+            inventory._remove(item.id)
+
+        list_time = timeit(list_ops, number=REPEATS) / REPEATS
+        counted_time = timeit(counted_ops, number=REPEATS) / REPEATS
+
+        print(
+            f"{units:>7} units: list {list_time * 1e6:9.2f}us, "
+            f"counted {counted_time * 1e6:6.2f}us per contains+count+add+remove"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares game data loading from YAML and from binary snapshot.
+
+Usage: python benchmarks/snapshot.py
+"""
+
+import os
+import sys
+import tempfile
+
+from time import perf_counter
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tarakania_rpg"))
+
+from rpg import snapshot  # noqa: E402
+
+ITEM_COUNTS = (100, 10_000, 100_000)
+
+
+def generate_items(count: int) -> str:
+    return yaml.safe_dump(
+        {
+            i: {
+                "name": f"Предмет {i}",
+                "damage": i % 10,
+                "ingredients": [i % 7, i % 11],
+                "modifiers": {"strength": i % 3, "agility": i % 5},
+            }
+            for i in range(count)
+        },
+        allow_unicode=True,
+    )
+
+
+def reset_snapshot(data_dir: str) -> None:
+    snapshot.DATA_DIR = data_dir
+    snapshot.SNAPSHOT_PATH = os.path.join(data_dir, "rpg.snapshot")
+    snapshot._entries = None
+    snapshot._dirty = False
+
+
+def main() -> None:
+    for count in ITEM_COUNTS:
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, "items.yaml")
+            with open(path, "w", encoding="utf8") as f:
+                f.write(generate_items(count))
+
+            reset_snapshot(data_dir)
+            start = perf_counter()
+            snapshot.load_file(path)
+            yaml_time = perf_counter() - start
+
+            snapshot.save_snapshot()
+
+            # simulate fresh process
+            reset_snapshot(data_dir)
+            start = perf_counter()
+            snapshot.load_file(path)
+            snapshot_time = perf_counter() - start
+
+        print(
+            f"{count:>7} items: yaml {yaml_time * 1000:9.1f}ms, "
+            f"snapshot {snapshot_time * 1000:7.1f}ms, "
+            f"x{yaml_time / snapshot_time:.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares shlex.split with argument tokenizer.
+
+Usage: python benchmarks/tokenizer.py
+"""
+
+import os
+import sys
+
+from shlex import split
+from timeit import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "tarakania_rpg"))
+
+from handler.tokenizer import tokenize  # noqa: E402
+
+SQL_QUERY = (
+    "SELECT p.discord_id, p.nick, p.xp, e.weapon FROM players p "
+    "LEFT JOIN equipment e ON e.discord_id = p.discord_id "
+    "WHERE p.nick LIKE 'a%' AND p.money > 100 "
+)
+
+INPUTS = {
+    "short": 'меч "Игрок с пробелом" 5',
+    "sql": SQL_QUERY,
+    "sql x20": "UNION ".join([SQL_QUERY] * 20),
+    "quoted x20": " ".join(['"quoted \\" value"', "'single'", "plain"] * 20),
+}
+REPEATS = 1000
+
+
+def main() -> None:
+    for name, text in INPUTS.items():
+        assert tokenize(text)[0] == split(text)
+
+        shlex_time = timeit(lambda: split(text), number=REPEATS) / REPEATS
+        tokenize_time = timeit(lambda: tokenize(text), number=REPEATS) / REPEATS
+
+        print(
+            f"{name:>10} ({len(text):>5} chars): shlex {shlex_time * 1e6:9.2f}us, "
+            f"tokenizer {tokenize_time * 1e6:7.2f}us, "
+            f"x{shlex_time / tokenize_time:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
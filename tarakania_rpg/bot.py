@@ -1,19 +1,26 @@
 import sys
+import asyncio
 import logging
 import argparse
 
-from typing import Any, Dict
+from time import time
+from typing import Any, Set, Dict, List, Tuple, Optional, Awaitable
 from contextlib import suppress
 
 import git
 import discord
 
 from sentry_sdk import capture_message
+from discord.utils import DISCORD_EPOCH
 
 from updater import start_updater
-from db.redis import create_redis_pool
+from db.redis import REDIS_ERRORS, create_redis_pool
 from db.postgres import create_pg_connection
 from handler.handler import Handler
+from rpg.leaderboard import leaderboard
+from rpg.player_cache import player_cache
+from handler.responses import ResponseTracker
+from utils.member_index import MemberIndexes
 
 TARAKANIA_RPG_ASCII_ART = r""" _____                _               _           __    ___  ___
 /__   \__ _ _ __ __ _| | ____ _ _ __ (_) __ _    /__\  / _ \/ _ \
@@ -22,6 +29,20 @@ TARAKANIA_RPG_ASCII_ART = r""" _____                _               _
  \/   \__,_|_|  \__,_|_|\_\__,_|_| |_|_|\__,_| \/ \_/\/   \____/
 """
 
+# returns all list elements and deletes it
+TAKE_LIST_SCRIPT = """
+local entries = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+return entries
+"""
+
+# maximum number of concurrent cleanup requests per channel
+CLEANUP_CONCURRENCY = 3
+
+BULK_DELETE_LIMIT = 100
+# discord does not allow bulk deleting messages older than 14 days
+BULK_DELETE_MAX_AGE = 13 * 86400
+
 log = logging.getLogger(__name__)
 
 
@@ -41,6 +62,12 @@ class TarakaniaRPG(discord.AutoShardedClient):
 
         super().__init__(**kwargs)
 
+        self.member_indexes = MemberIndexes(self)
+
+        # reference keeps rebuild task from being garbage collected
+        self._leaderboard_rebuild: Optional[asyncio.Task[None]] = None
+        self._cleanup_tasks: Set[asyncio.Task[None]] = set()
+
         # prevents bot from initislizing on reconnect
         self._first_on_ready = True
 
@@ -72,6 +99,15 @@ class TarakaniaRPG(discord.AutoShardedClient):
         self.redis = await create_redis_pool(self.config["redis"])
         self.pg = await create_pg_connection(self.config["postgresql"])
 
+        player_cache.set_redis(self.redis)
+        leaderboard.set_redis(self.redis)
+
+        # boards are readable while being rebuilt, startup does not wait for it
+        self._leaderboard_rebuild = asyncio.create_task(self._rebuild_leaderboard())
+
+        self.response_tracker = ResponseTracker(self.redis)
+        self.response_tracker.start()
+
         await self._handler.prepare_prefixes()
         await self._handler.load_all_commands()
 
@@ -84,6 +120,24 @@ class TarakaniaRPG(discord.AutoShardedClient):
             f"Ready to operate as {self.user}. Prefix: {self.config['default-prefix']}"
         )
 
+    async def close(self) -> None:
+        self._handler.stop()
+
+        # tracker is created in on_ready, bot can be closed before it
+        response_tracker = getattr(self, "response_tracker", None)
+        if response_tracker is not None:
+            response_tracker.stop()
+
+        await super().close()
+
+    async def _rebuild_leaderboard(self) -> None:
+        try:
+            await leaderboard.rebuild(self.pg)
+        except REDIS_ERRORS as e:
+            log.error(f"Unable to rebuild leaderboard: {e!r}")
+        except Exception:
+            log.exception("Error rebuilding leaderboard")
+
     async def on_message(self, msg: discord.Message) -> None:
         await self._handler.process_message(msg)
 
@@ -92,7 +146,14 @@ class TarakaniaRPG(discord.AutoShardedClient):
             return
 
         self._handler.cancel_command(new.id)
-        await self._clear_responses(new.id)
+
+        # entries have to be taken before new responses are registered, but
+        # command does not need to wait for actual deletion
+        entries = await self._take_responses(new.id)
+
+        task = asyncio.create_task(self._delete_responses(entries))
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_done)
 
         await self._handler.process_message(new)
 
@@ -123,25 +184,71 @@ class TarakaniaRPG(discord.AutoShardedClient):
         self._handler.cancel_command(event.message_id)
         await self._clear_responses(event.message_id)
 
+    async def on_member_join(self, member: discord.Member) -> None:
+        self.member_indexes.add_member(member)
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.member_indexes.remove_member(member)
+
+    async def on_member_update(
+        self, before: discord.Member, after: discord.Member
+    ) -> None:
+        if before.nick != after.nick:
+            self.member_indexes.add_member(after)
+
+    async def on_user_update(self, before: discord.User, after: discord.User) -> None:
+        if (before.name, before.discriminator) != (after.name, after.discriminator):
+            self.member_indexes.update_user(after)
+
+    async def on_guild_available(self, guild: discord.Guild) -> None:
+        # members could be chunked while guild was unavailable
+        self.member_indexes.remove_guild(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        self.member_indexes.remove_guild(guild)
+
     async def on_error(self, event: str, *args: Any, **kwargs: Any) -> None:
         log.exception(f"Error during event {event} execution")
 
-    async def _clear_responses(self, message_id: int) -> None:
-        address = f"message_responses:{message_id}"
+    async def _take_responses(self, message_id: int) -> List[bytes]:
+        """Atomically get and delete response entries of message."""
+
+        if self.redis.degraded:
+            return []
+
+        # make sure responses of message are written
+        await self.response_tracker.flush(message_id)
+
+        try:
+            return await self.redis.execute(
+                "EVAL", TAKE_LIST_SCRIPT, 1, self.response_tracker.address(message_id)
+            )
+        except REDIS_ERRORS as e:
+            log.warning(f"Unable to get responses of {message_id}: {e!r}")
 
-        entries = await self.redis.execute("LRANGE", address, 0, -1)
-        await self.redis.execute("DEL", address)
+            return []
 
-        for entry in reversed(entries):
+    def _cleanup_done(self, task: "asyncio.Task[None]") -> None:
+        self._cleanup_tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Error deleting responses", exc_info=task.exception())
+
+    async def _delete_responses(self, entries: List[bytes]) -> None:
+        """Delete messages and remove reactions listed in response entries."""
+
+        messages: Dict[int, List[int]] = {}
+        reactions: List[Tuple[int, int, str]] = []
+
+        for entry in entries:
             type_, data = entry.decode().split(":", 1)
 
             if type_ == "message":
-                channel_id, message_id = data.split(":")
+                raw_channel_id, raw_message_id = data.split(":")
 
-                with suppress(discord.HTTPException):
-                    await self.http.delete_message(int(channel_id), int(message_id))
+                messages.setdefault(int(raw_channel_id), []).append(int(raw_message_id))
             elif type_ == "reaction":
-                channel_id, message_id, reaction = data.split(":", 2)
+                raw_channel_id, raw_message_id, reaction = data.split(":", 2)
 
                 if reaction.isdigit():
                     e = self.get_emoji(int(reaction))
@@ -152,9 +259,75 @@ class TarakaniaRPG(discord.AutoShardedClient):
                 else:
                     emote = reaction
 
-                with suppress(discord.HTTPException):
-                    await self.http.remove_own_reaction(
-                        int(channel_id), int(message_id), emote
-                    )
+                reactions.append((int(raw_channel_id), int(raw_message_id), emote))
             else:
-                capture_message(f"Unknown response type: {type_}. Entry: {entry}")
+                capture_message(f"Unknown response type: {type_}. Entry: {entry!r}")
+
+        deleted_messages = set(m for ids in messages.values() for m in ids)
+
+        # requests are limited per channel
+        semaphores: Dict[int, asyncio.Semaphore] = {}
+
+        async def request(channel_id: int, coro: Awaitable[Any]) -> None:
+            semaphore = semaphores.get(channel_id)
+            if semaphore is None:
+                semaphore = semaphores[channel_id] = asyncio.Semaphore(
+                    CLEANUP_CONCURRENCY
+                )
+
+            async with semaphore:
+                with suppress(discord.HTTPException):
+                    await coro
+
+        requests = []
+
+        for channel_id, message_ids in messages.items():
+            for chunk in self._group_bulk_deletable(channel_id, message_ids):
+                if len(chunk) == 1:
+                    coro = self.http.delete_message(channel_id, chunk[0])
+                else:
+                    coro = self.http.delete_messages(channel_id, chunk)
+
+                requests.append(request(channel_id, coro))
+
+        for channel_id, message_id, emote in reactions:
+            if message_id in deleted_messages:
+                continue
+
+            requests.append(
+                request(
+                    channel_id,
+                    self.http.remove_own_reaction(channel_id, message_id, emote),
+                )
+            )
+
+        await asyncio.gather(*requests)
+
+    def _group_bulk_deletable(
+        self, channel_id: int, message_ids: List[int]
+    ) -> List[List[int]]:
+        """
+        Split message ids into groups suitable for bulk deletion. Messages that
+        can not be bulk deleted are returned as single element groups.
+        """
+
+        channel = self.get_channel(channel_id)
+        if not isinstance(channel, discord.TextChannel):
+            return [[m] for m in message_ids]
+
+        if not channel.permissions_for(channel.guild.me).manage_messages:
+            return [[m] for m in message_ids]
+
+        min_timestamp = (time() - BULK_DELETE_MAX_AGE) * 1000 - DISCORD_EPOCH
+
+        # snowflake contains creation time
+        recent = [m for m in message_ids if (m >> 22) > min_timestamp]
+        old = [[m] for m in message_ids if (m >> 22) <= min_timestamp]
+
+        return [
+            recent[i : i + BULK_DELETE_LIMIT]
+            for i in range(0, len(recent), BULK_DELETE_LIMIT)
+        ] + old
+
+    async def _clear_responses(self, message_id: int) -> None:
+        await self._delete_responses(await self._take_responses(message_id))
@@ -47,6 +47,11 @@ argparser.add_argument(
     action="store_true",
     help="Enables sentry. Defaults to false in debug mode. Otherwise true",
 )
+argparser.add_argument(
+    "--lazy-commands",
+    action="store_true",
+    help="Import command modules on first use. Can be overridden in command config",
+)
 
 
 def _verbosity_to_logging_level(string: str) -> int:
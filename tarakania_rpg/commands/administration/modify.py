@@ -1,7 +1,6 @@
-from yaml import safe_load
-
 from handler import Context, Arguments, CommandResult
 from rpg.items.item import Item
+from utils.yaml_loader import load
 
 
 async def run(ctx: Context, args: Arguments) -> CommandResult:
@@ -46,15 +45,13 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
         if len(args) == 2:
             return "Необходим аргумент со значением"
 
-        current_level[attribute_chain[-1]] = safe_load(args[2])
+        current_level[attribute_chain[-1]] = load(args[2])
 
     new_item = item.from_data(item_data)
 
-    # inject new item
-    del new_item._storage_by_id[item.id]
-    del new_item._storage_by_name[item.name.lower()]
-
-    new_item._storage_by_id[new_item.id] = new_item
-    new_item._storage_by_name[new_item.name.lower()] = new_item
+    # inject new item. new_item replaced id entry on creation, old name entry
+    # should be removed in case name was changed
+    item._unregister()
+    new_item._register()
 
     return f"Предмет: **{new_item!r}**\nЗначения: **{item_data}**"
@@ -1,37 +1,231 @@
+from typing import Any, List, Union, Optional
+
+import asyncpg
+
 from handler import Context, Arguments, CommandResult
 from paginator import PageType, RawPagePaginator
-from utils.formatting import TabularData, codeblock
+from utils.formatting import WIDTH_SAMPLE_SIZE, TableRenderer, codeblock
+
+# rows after this are not fetched
+MAX_ROWS = 10000
+STATEMENT_TIMEOUT = 30  # seconds
+
+# leaves space for codeblock and page footer within discord limit of 2000
+MAX_PAGE_LENGTH = 1900
+# column widths are shrunk to fit at least this number of rows into page
+MIN_ROWS_PER_PAGE = 10
+
+
+class FetchedRows:
+    """Rows fetched before commit, read by CursorPages the same way as cursor."""
+
+    __slots__ = ("_records", "_position")
+
+    def __init__(self, records: List[asyncpg.Record]):
+        self._records = records
+        self._position = 0
+
+    async def fetch(self, count: int) -> List[asyncpg.Record]:
+        records = self._records[self._position : self._position + count]
+        self._position += count
+
+        return records
+
+
+class CursorPages:
+    """
+    Table pages rendered from cursor rows on demand. Cursor only moves forward,
+    so rendered pages are kept for going back.
+
+    Column widths are sampled from the first rows and shared by all pages. One
+    row is fetched ahead to know if there is a next page.
+    """
+
+    __slots__ = (
+        "_cursor",
+        "_columns",
+        "_renderer",
+        "_rows_per_page",
+        "_buffer",
+        "_exhausted",
+        "pages",
+        "rows",
+    )
+
+    def __init__(
+        self, cursor: Union[asyncpg.cursor.Cursor, FetchedRows], columns: List[str]
+    ):
+        self._cursor = cursor
+        self._columns = columns
+
+        self._renderer: Optional[TableRenderer] = None
+        self._rows_per_page = 0
+
+        # fetched rows that are not rendered yet
+        self._buffer: List[List[Any]] = []
+        self._exhausted = False
+
+        self.pages: List[str] = []
+        self.rows = 0
+
+    @property
+    def done(self) -> bool:
+        return self._exhausted and not self._buffer
+
+    @property
+    def truncated(self) -> bool:
+        return self.rows >= MAX_ROWS
+
+    @property
+    def known_pages(self) -> int:
+        """Number of rendered pages, plus 1 if there are more rows."""
+
+        return len(self.pages) + (0 if self.done else 1)
+
+    async def _fill_buffer(self, size: int) -> None:
+        if self._exhausted or len(self._buffer) >= size:
+            return
+
+        limit = min(size - len(self._buffer), MAX_ROWS - self.rows)
+        records = await self._cursor.fetch(limit)
+
+        self._buffer.extend(list(r.values()) for r in records)
+        self.rows += len(records)
+
+        if len(records) < limit or self.truncated:
+            self._exhausted = True
+
+    async def _get_renderer(self) -> TableRenderer:
+        if self._renderer is None:
+            await self._fill_buffer(WIDTH_SAMPLE_SIZE)
+
+            self._renderer = TableRenderer.from_sample(
+                self._columns,
+                self._buffer,
+                max_row_length=TableRenderer.max_row_length(
+                    MAX_PAGE_LENGTH, MIN_ROWS_PER_PAGE
+                ),
+            )
+            self._rows_per_page = self._renderer.rows_per_page(MAX_PAGE_LENGTH)
+
+        return self._renderer
+
+    async def _render_next(self) -> None:
+        renderer = await self._get_renderer()
+
+        await self._fill_buffer(self._rows_per_page + 1)
 
-LINES_PER_PAGE = 1
+        self.pages.append(renderer.render_page(self._buffer[: self._rows_per_page]))
+        del self._buffer[: self._rows_per_page]
+
+    async def get(self, index: int) -> Optional[str]:
+        """Get page by index, None if there are less pages."""
+
+        while len(self.pages) <= index and not self.done:
+            await self._render_next()
+
+        if index < len(self.pages):
+            return self.pages[index]
+
+        return None
+
+
+async def _set_timeout(conn: asyncpg.Connection) -> None:
+    await conn.execute(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT * 1000}")
 
 
 async def run(ctx: Context, args: Arguments) -> CommandResult:
+    query = " ".join(args)
+
     try:
-        result = await ctx.bot.pg.fetch(" ".join(args))
-    except Exception as e:
+        async with ctx.bot.pg.acquire() as conn:
+            statement = await conn.prepare(query)
+            columns = [a.name for a in statement.get_attributes()]
+
+            if columns:
+                try:
+                    return await _run_readonly(ctx, conn, statement, columns)
+                except asyncpg.ReadOnlySQLTransactionError:
+                    pass  # statement changes data
+
+            # changes are committed before paginating, pages are rendered from
+            # fetched rows without holding connection and row locks
+            async with conn.transaction():
+                await _set_timeout(conn)
+
+                if not columns:  # statement returns no rows
+                    await statement.fetch()
+
+                    return codeblock(statement.get_statusmsg())
+
+                cursor = await statement.cursor()
+                records = await cursor.fetch(MAX_ROWS)
+    except asyncpg.PostgresError as e:
         return f"Произошла ошибка: {codeblock(str(e))}"
-    if len(result) > 0:
-        table = TabularData()
-        table.set_columns(list(result[0].keys()))
-        table.add_rows(list(r.values() for r in result))
-        result = table.render()
-        if len(result) > 2000:
-            ii = 0
-            lines = []
-            for i in range(0, len(result), 1500):
-                lines.append(result[ii:i])
-                ii = i
-
-            p = RawPagePaginator(len(lines))
-
-            @p.on_page_switch
-            async def f(current_page: int, next_page: int) -> PageType:
-                nl = ""
-                return (
-                    f"{codeblock(nl.join(lines[next_page]))}"
-                    f"Страница **{next_page + 1}** из **{p.size}**"
-                )
-
-            return await p.run(ctx)
-
-    return codeblock(result)
+
+    return await _start_pages(ctx, CursorPages(FetchedRows(records), columns))
+
+
+async def _run_readonly(
+    ctx: Context,
+    conn: asyncpg.Connection,
+    statement: asyncpg.prepared_stmt.PreparedStatement,
+    columns: List[str],
+) -> CommandResult:
+    """
+    Paginate rows from cursor. Server side cursors only exist inside
+    transaction, it is kept open while paginator runs. Raises
+    ReadOnlySQLTransactionError if statement changes data.
+    """
+
+    async with conn.transaction(readonly=True):
+        await _set_timeout(conn)
+
+        pages = CursorPages(await statement.cursor(), columns)
+
+        # connection is held while paginating, concurrency limit still applies
+        return await _start_pages(ctx, pages, keep_command_slot=True)
+
+
+async def _start_pages(
+    ctx: Context, pages: CursorPages, keep_command_slot: bool = False
+) -> CommandResult:
+    try:
+        # statement is executed here, before paginator starts
+        await pages.get(0)
+    except ValueError:  # row does not fit into page
+        return "Слишком много столбцов для вывода"
+
+    return await _paginate(ctx, pages, keep_command_slot)
+
+
+async def _paginate(
+    ctx: Context, pages: CursorPages, keep_command_slot: bool
+) -> CommandResult:
+    p = RawPagePaginator(
+        pages.known_pages, cache_pages=False, keep_command_slot=keep_command_slot
+    )
+
+    @p.on_page_switch
+    async def f(current_page: int, next_page: int) -> PageType:
+        try:
+            page = await pages.get(next_page)
+        except asyncpg.PostgresError as e:
+            p.stop()
+
+            return f"Произошла ошибка: {codeblock(str(e))}"
+
+        # paginator can move further as long as cursor has rows
+        p.size = pages.known_pages
+
+        if page is None:
+            page = "Строк больше нет"
+
+        total = f"{p.size}{'' if pages.done else '+'}"
+        footer = f"Страница **{next_page + 1}** из **{total}**"
+        if pages.done and pages.truncated:
+            footer += f", показаны первые **{MAX_ROWS}** строк"
+
+        return f"{codeblock(page)}{footer}"
+
+    return await p.run(ctx)
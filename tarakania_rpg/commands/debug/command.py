@@ -12,6 +12,7 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
         "arguments": len(args),
         "author": ctx.author,
         "guild": ctx.guild,
+        "scheduler": ctx.bot._handler.scheduler.stats,
     }
 
     return codeblock("\n".join(f"{k}: {v}" for k, v in info.items()))
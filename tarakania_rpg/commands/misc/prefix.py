@@ -0,0 +1,25 @@
+from handler import Context, Arguments, CommandResult
+from handler.prefixes import MAX_PREFIX_LENGTH
+
+
+async def run(ctx: Context, args: Arguments) -> CommandResult:
+    if args[0] is None:
+        return f"Текущий префикс: **{ctx.local_prefix}**"
+
+    if not ctx.author.guild_permissions.manage_guild:
+        return "Для изменения префикса нужно право управления сервером"
+
+    prefix = args[0].strip().lower()
+    if not prefix:
+        # empty prefix would make any message starting with command a command
+        return "Префикс не может быть пустым"
+
+    if len(prefix) > MAX_PREFIX_LENGTH:
+        return f"Префикс не может быть длиннее {MAX_PREFIX_LENGTH} символов"
+
+    if prefix == ctx.bot.config["default-prefix"].lower():
+        await ctx.bot._handler.set_custom_prefix(ctx.guild.id, None)
+    else:
+        await ctx.bot._handler.set_custom_prefix(ctx.guild.id, prefix)
+
+    return f"Префикс изменён на **{prefix}**"
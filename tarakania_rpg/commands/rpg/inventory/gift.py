@@ -1,4 +1,5 @@
 from handler import Context, Arguments, CommandResult
+from rpg.player import ItemNotFound, UnknownPlayer
 from utils.confirmations import request_confirmation
 from utils.command_helpers import get_author_player
 
@@ -10,16 +11,6 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
     item = args[0]
     player2 = args[1]
 
-    if args[2] == "all":
-        count = player.inventory.get_count(item)
-    else:
-        if args[2].isdigit():
-            count = int(args[2])
-            if int(args[2]) < 1:
-                return "Количество должно быть больше нуля"
-        else:
-            return "Передано неверное значение аргумента"
-
     if player == player2:
         return "Нельзя дарить вещи себе"
 
@@ -29,8 +20,29 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
     elif item in player.equipment:
         from_equipment = True
     else:
+        # local data could be outdated, next read loads player again
+        await player._invalidate_cache()
+
         return f"В вашем инвентаре и экипировке нет **{item}**"
 
+    if args[2] == "all":
+        count = 1 if from_equipment else player.inventory.get_count(item)
+    else:
+        if args[2].isdigit():
+            count = int(args[2])
+            if int(args[2]) < 1:
+                return "Количество должно быть больше нуля"
+        else:
+            return "Передано неверное значение аргумента"
+
+    if from_equipment and count != 1:
+        return f"Из экипировки можно передать только **1** **{item}**"
+
+    if not from_equipment and count > player.inventory.get_count(item):
+        await player._invalidate_cache()
+
+        return f"В вашем инвентаре недостаточно **{item}**"
+
     confirmation_request = await ctx.send(
         f"Вы действительно хотите передать **{item}** в количестве **{count}** персонажу **{player2}**?"
     )
@@ -40,8 +52,19 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
         return await confirmation_request.edit(
             content="Вы не подтвердили передачу предемета"
         )
-    await player.inventory.remove(item, player, ctx.bot.pg, count=count)
-    await player2.inventory.add(item, player2, ctx.bot.pg, count=count)
+
+    try:
+        await player.transfer_items(
+            player2, item, count, ctx.bot.pg, from_equipment=from_equipment
+        )
+    except ItemNotFound:
+        return await confirmation_request.edit(
+            content=f"В вашем инвентаре недостаточно **{item}**"
+        )
+    except UnknownPlayer:
+        return await confirmation_request.edit(
+            content=f"Персонаж **{player2}** не найден"
+        )
 
     return await confirmation_request.edit(
         content=(
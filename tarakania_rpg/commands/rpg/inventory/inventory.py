@@ -1,7 +1,4 @@
-from typing import Dict
-
 from handler import Context, Arguments, CommandResult
-from rpg.items import Item
 from utils.formatting import codeblock
 from utils.command_helpers import get_author_player
 
@@ -10,13 +7,9 @@ async def run(ctx: Context, args: Arguments) -> CommandResult:
     player = await get_author_player(ctx)
 
     if player.inventory.size:
-        counts: Dict[Item, int] = {}
-        for item in player.inventory:
-            counts[item] = counts.get(item, 0) + 1
-
         inventory = "\n".join(
             f"{item}{' x ' + str(count) if count > 1 else ''}"
-            for item, count in counts.items()
+            for item, count in player.inventory.counts()
         )
     else:
         inventory = "Ваш инвентарь пуст"
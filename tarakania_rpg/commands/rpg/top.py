@@ -0,0 +1,75 @@
+from handler import Context, Arguments, CommandResult
+from db.redis import REDIS_ERRORS
+from paginator import PageType, RawPagePaginator
+from rpg.leaderboard import board_key, leaderboard
+from utils.formatting import codeblock
+
+PLAYERS_PER_PAGE = 10
+
+BOARD_NAMES = {
+    "опыт": "xp",
+    "деньги": "money",
+    "уровень": "level",
+    "xp": "xp",
+    "money": "money",
+    "level": "level",
+}
+BOARD_TITLES = {"xp": "опыту", "money": "деньгам", "level": "уровню"}
+
+UNAVAILABLE_MESSAGE = "Рейтинг временно недоступен, попробуйте позже"
+
+
+async def run(ctx: Context, args: Arguments) -> CommandResult:
+    board = BOARD_NAMES.get(args[0].lower())
+    if board is None:
+        return "Неизвестный рейтинг. Доступные рейтинги: **опыт, деньги, уровень**"
+
+    is_global = ctx.guild is None or "global" in args.flags
+
+    async def get_key() -> str:
+        if is_global:
+            return board_key(board)
+
+        # guild board expires while paginator is running, it is built again
+        return await leaderboard.guild_key(
+            board, ctx.guild.id, lambda: [m.id for m in ctx.guild.members]
+        )
+
+    try:
+        key = await get_key()
+        total = await leaderboard.count(key)
+        rank = await leaderboard.rank(key, ctx.author.id)
+    except REDIS_ERRORS:
+        return UNAVAILABLE_MESSAGE
+
+    if total == 0:
+        return "В рейтинге пока нет игроков"
+
+    scope = "Глобальный рейтинг" if is_global else "Рейтинг сервера"
+    title = f"{scope} по {BOARD_TITLES[board]}"
+    if rank is not None:
+        title += f", ваше место: **{rank + 1}**"
+
+    p = RawPagePaginator((total + PLAYERS_PER_PAGE - 1) // PLAYERS_PER_PAGE)
+
+    @p.on_page_switch
+    async def f(current_page: int, next_page: int) -> PageType:
+        start = next_page * PLAYERS_PER_PAGE
+
+        try:
+            entries = await leaderboard.page(await get_key(), start, PLAYERS_PER_PAGE)
+        except REDIS_ERRORS:
+            return UNAVAILABLE_MESSAGE
+
+        nl = "\n"
+        lines = [
+            f"{start + i + 1:>5} {score:>10} {nick}"
+            for i, (nick, score) in enumerate(entries)
+        ]
+
+        return (
+            f"{title}{codeblock(nl.join(lines) or '-')}"
+            f"Страница **{next_page + 1}** из **{p.size}**"
+        )
+
+    return await p.run(ctx)
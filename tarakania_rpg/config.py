@@ -4,9 +4,8 @@ import logging
 
 from typing import Any, Dict
 
-import yaml
-
 from constants import DATA_DIR
+from utils.yaml_loader import load_file
 
 
 def get_bot_config(path: str) -> Dict[str, Any]:
@@ -19,5 +18,4 @@ def get_bot_config(path: str) -> Dict[str, Any]:
 
         sys.exit(1)
 
-    with open(path, "r") as f:
-        return yaml.load(f, Loader=yaml.SafeLoader)
+    return load_file(path)
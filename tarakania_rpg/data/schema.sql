@@ -32,3 +32,87 @@ CREATE TABLE equipment (
   boots      smallint,
   shield     smallint
 );
+
+CREATE TABLE guild_prefixes (
+  guild_id bigint PRIMARY KEY,
+  prefix   varchar (32) NOT NULL
+);
+
+-- FUNCTIONS --
+
+/* Removes one occurrence of each element of items from inventory.
+ * Raises no_data_found if inventory does not contain enough items
+ */
+CREATE FUNCTION inventory_remove(inventory integer[], items integer[])
+RETURNS integer[] AS $$
+DECLARE
+  item     integer;
+  position integer;
+BEGIN
+  FOREACH item IN ARRAY items LOOP
+    position := array_position(inventory, item);
+
+    IF position IS NULL THEN
+      RAISE EXCEPTION 'item % not found in inventory', item
+        USING ERRCODE = 'no_data_found';
+    END IF;
+
+    inventory := inventory[:position - 1] || inventory[position + 1:];
+  END LOOP;
+
+  RETURN inventory;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+/* Moves items from sender to receiver. Equipped item is moved if slot is set.
+ * Both players are locked for the duration of transaction.
+ * Raises no_data_found if sender does not have items, undefined_object if
+ * one of players does not exist
+ */
+CREATE FUNCTION inventory_transfer(
+  sender   bigint,
+  receiver bigint,
+  item     integer,
+  amount   integer,
+  slot     text DEFAULT NULL
+)
+RETURNS void AS $$
+DECLARE
+  locked  integer;
+  updated integer;
+BEGIN
+  -- rows are always locked in the same order to avoid deadlocks
+  SELECT count(*) INTO locked FROM (
+    SELECT discord_id FROM players
+    WHERE discord_id IN (sender, receiver)
+    ORDER BY discord_id
+    FOR UPDATE
+  ) AS locked_players;
+
+  IF locked != 2 THEN
+    RAISE EXCEPTION 'player % or % not found', sender, receiver
+      USING ERRCODE = 'undefined_object';
+  END IF;
+
+  IF slot IS NULL THEN
+    UPDATE players
+    SET inventory = inventory_remove(inventory, array_fill(item, ARRAY[amount]))
+    WHERE discord_id = sender;
+  ELSE
+    EXECUTE format(
+      'UPDATE equipment SET %I = NULL WHERE discord_id = $1 AND %I = $2', slot, slot
+    ) USING sender, item;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+
+    IF updated = 0 THEN
+      RAISE EXCEPTION 'item % is not equipped', item
+        USING ERRCODE = 'no_data_found';
+    END IF;
+  END IF;
+
+  UPDATE players
+  SET inventory = inventory || array_fill(item, ARRAY[amount])
+  WHERE discord_id = receiver;
+END;
+$$ LANGUAGE plpgsql;
@@ -1,39 +1,178 @@
-from typing import Any, Dict
-from asyncio import sleep
+import random
+import asyncio
+
+from time import monotonic
+from typing import Any, Dict, Optional
 from logging import getLogger
 
 import aioredis
 
 log = getLogger(__name__)
 
+# errors that mean redis is not reachable
+CONNECTION_ERRORS = (
+    aioredis.ConnectionClosedError,
+    aioredis.PoolClosedError,
+    ConnectionRefusedError,
+    asyncio.TimeoutError,
+)
+# all errors best-effort callers should handle
+REDIS_ERRORS = (aioredis.RedisError, *CONNECTION_ERRORS)
+
+
+class CircuitOpenError(aioredis.RedisError):
+    """Raised instead of executing command while redis is considered down."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending commands after repeated failures. After reset_timeout passes,
+    single probe command is allowed. Success of probe closes circuit, failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    __slots__ = ("_failure_threshold", "_reset_timeout", "_failures", "_opened_at")
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+
+        if monotonic() - self._opened_at < self._reset_timeout:
+            return self.OPEN
+
+        return self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+
+        if state == self.OPEN:
+            return False
+
+        # let single probe through, reopen circuit for others until it finishes
+        self._opened_at = monotonic()
+
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            log.info("Redis circuit closed")
+
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        self._failures += 1
+
+        if self._opened_at is not None or self._failures >= self._failure_threshold:
+            if self._opened_at is None:
+                log.error(f"Redis circuit opened after {self._failures} failures")
+
+            self._opened_at = monotonic()
+
 
 class _ConnectionsPool(aioredis.ConnectionsPool):
     def __init__(
-        self, *args: Any, retry_count: int = 5, retry_interval: int = 2, **kwargs: Any
+        self,
+        *args: Any,
+        retry_count: int = 5,
+        retry_interval: float = 0.1,
+        max_retry_interval: float = 2,
+        command_timeout: float = 5,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        **kwargs: Any,
     ) -> None:
         super().__init__(*args, **kwargs)
 
         self._retry_count = retry_count
         self._retry_interval = retry_interval
+        self._max_retry_interval = max_retry_interval
+        self._command_timeout = command_timeout
+
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+    @property
+    def degraded(self) -> bool:
+        """
+        Redis is considered unavailable. Best-effort callers should skip it.
+        """
+
+        return self.circuit_breaker.state != CircuitBreaker.CLOSED
+
+    def _get_retry_delay(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(
+            0, min(self._max_retry_interval, self._retry_interval * 2 ** attempt)
+        )
+
+    async def execute(
+        self,
+        command: str,
+        *args: Any,
+        command_timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        Execute command. command_timeout limits total time spent including
+        retries.
+        """
 
-    async def execute(self, command: str, *args: Any, **kwargs: Any) -> Any:
         exc: Exception
 
+        if not self.circuit_breaker.allow_request():
+            raise CircuitOpenError(f"Redis is unavailable, {command} not executed")
+
+        if command_timeout is None:
+            command_timeout = self._command_timeout
+
+        deadline = monotonic() + command_timeout
+
         for i in range(self._retry_count):
             try:
-                return await super().execute(command, *args, **kwargs)
-            except (
-                aioredis.ConnectionClosedError,
-                aioredis.PoolClosedError,
-                ConnectionRefusedError,
-            ) as e:
+                result = await asyncio.wait_for(
+                    super().execute(command, *args, **kwargs),
+                    max(deadline - monotonic(), 0),
+                )
+            except aioredis.ReplyError:
+                # redis is reachable, error is caused by command
+                self.circuit_breaker.record_success()
+
+                raise
+            except CONNECTION_ERRORS as e:
+                self.circuit_breaker.record_failure()
+
                 log.debug(
-                    f"Command {command} failed, remaining attempts: {self._retry_count - i}"
+                    f"Command {command} failed, remaining attempts: {self._retry_count - i - 1}"
                 )
                 exc = e
-                await sleep(self._retry_interval)
 
-        log.error(f"Command {command} has failed after {self._retry_count} retries")
+                delay = self._get_retry_delay(i)
+                if monotonic() + delay >= deadline:
+                    break
+
+                if not self.circuit_breaker.allow_request():
+                    break
+
+                await asyncio.sleep(delay)
+            else:
+                self.circuit_breaker.record_success()
+
+                return result
+
+        log.error(f"Command {command} has failed after {i + 1} attempts")
 
         raise exc
 
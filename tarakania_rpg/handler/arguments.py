@@ -1,22 +1,47 @@
-from typing import Any, List, Union, Iterator, overload
+import asyncio
+
+from time import perf_counter
+from typing import Any, List, Union, Callable, Iterator, Optional, overload, AbstractSet
 from logging import getLogger
 from itertools import zip_longest
 
 from .context import Context
+from .tokenizer import FlagsType, tokenize
 from .converters import Converter
 from .exceptions import ConvertError, TooFewArguments, TooManyArguments
 
 log = getLogger(__name__)
 
+# conversions slower than this are logged, seconds
+SLOW_CONVERSION_TIME = 0.5
 
-class Arguments:
-    def __init__(self, args: List[str]):
-        # TODO: flags support?
+ConversionHook = Callable[[Converter, float], None]
+
+
+def log_slow_conversion(converter: Converter, elapsed: float) -> None:
+    if elapsed >= SLOW_CONVERSION_TIME:
+        log.warning(f"Slow {converter} conversion: {round(elapsed * 1000)}ms")
 
+
+# called with converter and conversion time in seconds after each conversion
+conversion_hooks: List[ConversionHook] = [log_slow_conversion]
+
+
+class Arguments:
+    def __init__(self, args: List[str], flags: Optional[FlagsType] = None):
         self._args = args
+        self.flags = {} if flags is None else flags
 
         self._converted: List[Any] = []
 
+    @classmethod
+    def from_string(
+        cls, text: str, flag_names: AbstractSet[str] = frozenset()
+    ) -> "Arguments":
+        """Tokenize text. Raises TokenizeError."""
+
+        return cls(*tokenize(text, flag_names))
+
     async def convert(self, ctx: Context, converters: List[Converter]) -> None:
         actual_values = []
         actual_converters: List[Converter] = []
@@ -46,18 +71,61 @@ class Arguments:
             else:
                 actual_converters.append(converter)
 
-        for value, converter in zip(actual_values, actual_converters):
-            try:
-                converted = await converter.convert(ctx, value)
-            except ConvertError:
-                raise
-            except Exception as e:
-                log.debug(
-                    f"Unhandled {converter} converter exception: {e.__class__.__name__}: {e}"
-                )
-                raise ConvertError(value, converter) from e
-
-            self._converted.append(converted)
+        values = list(zip(actual_values, actual_converters))
+        results: List[Any] = [None] * len(values)
+
+        io_indexes = [i for i, (_, c) in enumerate(values) if c.uses_io]
+        if len(io_indexes) < 2:
+            io_indexes = []
+
+        # converters making requests are independent, run them concurrently
+        io_results = asyncio.gather(
+            *(self._convert_one(ctx, *values[i]) for i in io_indexes),
+            return_exceptions=True,
+        )
+
+        try:
+            for i, (value, converter) in enumerate(values):
+                if i in io_indexes:
+                    continue
+
+                try:
+                    results[i] = await self._convert_one(ctx, value, converter)
+                except ConvertError as e:
+                    results[i] = e
+        except BaseException:
+            io_results.cancel()
+
+            raise
+
+        for i, result in zip(io_indexes, await io_results):
+            results[i] = result
+
+        # the first invalid argument is reported, same as in sequential conversion
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        self._converted.extend(results)
+
+    @staticmethod
+    async def _convert_one(ctx: Context, value: Any, converter: Converter) -> Any:
+        start = perf_counter()
+
+        try:
+            return await converter.convert(ctx, value)
+        except ConvertError:
+            raise
+        except Exception as e:
+            log.debug(
+                f"Unhandled {converter} converter exception: {e.__class__.__name__}: {e}"
+            )
+            raise ConvertError(value, converter) from e
+        finally:
+            elapsed = perf_counter() - start
+
+            for hook in conversion_hooks:
+                hook(converter, elapsed)
 
     def __len__(self) -> int:
         return len(self._args)
@@ -1,13 +1,15 @@
 import os
 import typing
+import asyncio
 import importlib
 
 from types import ModuleType
 from logging import getLogger
 
-import yaml
 import discord
 
+from utils.yaml_loader import load_file
+
 from .context import Context
 from .arguments import Arguments
 from .converters import Converter
@@ -38,16 +40,28 @@ class Command:
         self.hidden: bool
         self.guild_only: bool
         self.owner_only: bool
+        # import module on first run
+        self.lazy: bool
 
         self.arguments: typing.List[Converter]
 
-        self._imported: ModuleType
+        self.flags: typing.FrozenSet[str] = frozenset()
+        # maximum number of simultaneous runs, unlimited if not set
+        self.concurrency: typing.Optional[int] = None
+
+        self._imported: typing.Optional[ModuleType] = None
+        self._loaded = False
+        self._load_task: typing.Optional[asyncio.Task[None]] = None
 
-        self._run_fn: typing.Callable[
-            [Context, Arguments], typing.Awaitable[CommandResult]
-        ]
-        self._init_fn: typing.Callable[[], typing.Awaitable[None]]
-        self._unload_fn: typing.Callable[[], typing.Awaitable[None]]
+        self._run_fn: typing.Optional[
+            typing.Callable[[Context, Arguments], typing.Awaitable[CommandResult]]
+        ] = None
+        self._init_fn: typing.Optional[
+            typing.Callable[[], typing.Awaitable[None]]
+        ] = None
+        self._unload_fn: typing.Optional[
+            typing.Callable[[], typing.Awaitable[None]]
+        ] = None
 
         self._subcommands = typing.Dict[str, typing.Any]
 
@@ -55,15 +69,17 @@ class Command:
         self._path = command_path
 
         self._load_configuration()
-        self._load_functions()
+
+        if not self.lazy:
+            self._load_functions()
+            self._loaded = True
 
     def _load_configuration(self) -> None:
         configuration_path = f"{self._path}.yaml"
 
         log.debug(f"Reading configuration from {configuration_path}")
 
-        with open(configuration_path, encoding="utf8") as f:
-            data = yaml.load(f, Loader=yaml.SafeLoader)
+        data = load_file(configuration_path)
 
         if data is None:  # empty file
             data = {}
@@ -86,6 +102,10 @@ class Command:
         self.owner_only = data.get("owner_only", False)
         # hidden by default if owner_only is set
         self.hidden = data.get("hidden", self.owner_only)
+        self.lazy = data.get("lazy", self.bot.args.lazy_commands)
+
+        self.flags = frozenset(data.get("flags", ()))
+        self.concurrency = data.get("concurrency")
 
         self.arguments = []
         for i in data.get("arguments", ()):
@@ -114,7 +134,8 @@ class Command:
         else:
             aliases = self.aliases[0]
 
-        arguments = " ".join(c.get_usage() for c in self.arguments)
+        flags = [f"[--{f}]" for f in sorted(self.flags)]
+        arguments = " ".join(flags + [c.get_usage() for c in self.arguments])
 
         return f"{prefix}{aliases} {arguments}"
 
@@ -146,16 +167,42 @@ class Command:
     async def reload(self) -> None:
         await self.unload()
 
-        importlib.reload(self._imported)
+        if self._imported is not None:
+            importlib.reload(self._imported)
 
         self._load_configuration()
-        self._load_functions()
 
-        await self.init()
+        # lazy commands that were never used stay unloaded
+        if self._loaded or not self.lazy:
+            self._load_functions()
+            self._loaded = True
+
+            await self.init()
+
+    async def _load_lazily(self) -> None:
+        log.debug(f"Lazily loading {self.name}")
+
+        try:
+            await self.bot.loop.run_in_executor(None, self._load_functions)
+            await self.init()
+        except Exception:
+            # allow next run to retry
+            self._load_task = None
+
+            raise
+
+        self._loaded = True
 
     async def run(self, ctx: Context, args: Arguments) -> CommandResult:
+        if not self._loaded:
+            if self._load_task is None:
+                self._load_task = asyncio.create_task(self._load_lazily())
+
+            # cancellation of command should not interrupt loading
+            await asyncio.shield(self._load_task)
+
         if self._run_fn is None:
-            return
+            return None
 
         # TODO: sybcommand logic
         return await self._run_fn(ctx, args)
@@ -1,7 +1,11 @@
-from typing import TYPE_CHECKING, Any, Union, Optional
+import asyncio
+
+from typing import TYPE_CHECKING, Any, Dict, Union, Callable, Optional, Awaitable
 
 import discord
 
+from rpg.player import Player, UnknownPlayer
+
 if TYPE_CHECKING:
     from bot import TarakaniaRPG
     from .command import Command
@@ -9,8 +13,6 @@ if TYPE_CHECKING:
 
 _ReactionsType = Union[int, str, discord.Emoji]
 
-CACHE_TTL = 86400  # 24 hours
-
 
 class Context:
     __slots__ = (
@@ -22,6 +24,8 @@ class Context:
         "command",
         "prefix",
         "alias",
+        "_players",
+        "_release_slots",
     )
 
     def __init__(
@@ -42,6 +46,79 @@ class Context:
         self.channel = message.channel
         self.guild = message.guild
 
+        # players loaded during this invocation, None for unknown ids
+        self._players: Dict[int, asyncio.Future[Optional[Player]]] = {}
+
+        # set by handler while command holds scheduler slots
+        self._release_slots: Optional[Callable[[bool], Awaitable[None]]] = None
+
+    async def release_slots(self, keep_command_slot: bool = False) -> None:
+        """
+        Let other commands run while this one waits for user input. Should be
+        called before long waits: paginators and confirmations.
+
+        If keep_command_slot is set, concurrency limit of command stays in
+        effect until command finishes.
+        """
+
+        if self._release_slots is not None:
+            await self._release_slots(keep_command_slot)
+
+    async def get_players(self, *discord_ids: int) -> Dict[int, Player]:
+        """
+        Load players, each of them at most once per invocation. Ids not loaded
+        yet are fetched in a single query. Unknown ids are skipped.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        futures: Dict[int, asyncio.Future[Optional[Player]]] = {}
+        for discord_id in set(discord_ids):
+            if discord_id not in self._players:
+                futures[discord_id] = self._players[discord_id] = loop.create_future()
+
+        # taken before loading, failed loads are removed from cache
+        waiting = [(i, self._players[i]) for i in discord_ids]
+
+        if futures:
+            try:
+                loaded = await Player.from_ids(futures.keys(), self.bot.pg)
+            except asyncio.CancelledError:
+                for discord_id, future in futures.items():
+                    del self._players[discord_id]
+                    future.cancel()
+
+                raise
+            except Exception as e:
+                for discord_id, future in futures.items():
+                    del self._players[discord_id]
+
+                    future.set_exception(e)
+                    # exception is propagated below, prevent unretrieved warning
+                    future.exception()
+
+                raise
+
+            for discord_id, future in futures.items():
+                future.set_result(loaded.get(discord_id))
+
+        players = {}
+        for discord_id, future in waiting:
+            player = await future
+            if player is not None:
+                players[discord_id] = player
+
+        return players
+
+    async def get_player(self, discord_id: int) -> Player:
+        """Load single player. Raises UnknownPlayer."""
+
+        player = (await self.get_players(discord_id)).get(discord_id)
+        if player is None:
+            raise UnknownPlayer
+
+        return player
+
     async def send(
         self,
         content: Optional[str] = None,
@@ -99,12 +176,9 @@ class Context:
     async def _register_message_response(
         self, response_to: discord.Message, response: discord.Message
     ) -> None:
-        address = f"message_responses:{response_to.id}"
-
-        await self.bot.redis.execute(
-            "RPUSH", address, f"message:{response.channel.id}:{response.id}"
+        await self.bot.response_tracker.register(
+            response_to.id, f"message:{response.channel.id}:{response.id}"
         )
-        await self.bot.redis.execute("EXPIRE", address, CACHE_TTL)
 
     async def _register_reaction_response(
         self,
@@ -112,12 +186,9 @@ class Context:
         response: discord.Message,
         reaction: _ReactionsType,
     ) -> None:
-        address = f"message_responses:{response_to.id}"
-
-        await self.bot.redis.execute(
-            "RPUSH", address, f"reaction:{response.channel.id}:{response.id}:{reaction}"
+        await self.bot.response_tracker.register(
+            response_to.id, f"reaction:{response.channel.id}:{response.id}:{reaction}"
         )
-        await self.bot.redis.execute("EXPIRE", address, CACHE_TTL)
 
     @property
     def me(self) -> Union[discord.ClientUser, discord.Member]:
@@ -125,8 +196,9 @@ class Context:
 
     @property
     def local_prefix(self) -> str:
-        if self.guild is not None:
-            guild_prefix = self.bot._handler._custom_prefixes.get(self.guild.id)
+        prefixes = self.bot._handler.prefixes
+        if self.guild is not None and prefixes is not None:
+            guild_prefix = prefixes.get_custom_prefix(self.guild.id)
             if guild_prefix is not None:
                 return guild_prefix
 
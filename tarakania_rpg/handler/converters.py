@@ -10,7 +10,6 @@ from rpg.race import Race as Race_
 from rpg.items import Item as Item_
 from rpg.class_ import Class as Class_
 from rpg.player import Player as Player_
-from rpg.player import UnknownPlayer
 from rpg.location import Location as Location_
 from rpg.rpg_object import UnknownObject
 
@@ -56,6 +55,8 @@ class _ConverterMeta(type):
 # TODO: a way to subclass conventer with actual class defining convert function
 class Converter(metaclass=_ConverterMeta):
     type_name = ""
+    # conversion can make network requests, such converters run concurrently
+    uses_io = False
 
     @classmethod
     def new(cls, data: Dict[str, Any]) -> Converter:
@@ -202,6 +203,7 @@ class Location(Converter):
 
 class User(Converter):
     type_name = "user"
+    uses_io = True
 
     async def convert(self, ctx: Context, value: str) -> discord.User:
         user = None
@@ -212,12 +214,8 @@ class User(Converter):
             if ctx.guild is not None:
                 user = ctx.guild.get_member(user_id)
             if user is None:
-                # double check of ctx.guild, but we need to ensure we won't
-                # get member object from other guild by accident
-                for guild in ctx.bot.guilds or []:
-                    user = guild.get_member(user_id)
-                    if user is not None:
-                        break
+                # user cache, does not return member object from other guild
+                user = ctx.bot.get_user(user_id)
 
             if user is None:
                 try:
@@ -231,22 +229,14 @@ class User(Converter):
         if ctx.guild is None:
             return None
 
+        index = ctx.bot.member_indexes.get(ctx.guild)
+
         found = []
-        pattern = value.lower()
-
-        for member in ctx.guild.members:
-            match_pos = -1
-            if member.nick is not None:
-                match_pos = member.nick.lower().find(pattern)
-            if match_pos == -1:
-                match_pos = f"{member.name.lower()}#{member.discriminator}".find(
-                    pattern
-                )
-            if match_pos == -1:
-                continue
-            found.append((member, match_pos))
+        for member_id, match_pos in index.search(value.lower()):
+            member = ctx.guild.get_member(member_id)
+            if member is not None:
+                found.append((member, match_pos))
 
-        found = list(set(found))
         found.sort(
             key=lambda x: (
                 # last member message timestamp, lower delta is better
@@ -273,7 +263,11 @@ class Player(User):
     async def convert(self, ctx: Context, value: str) -> Player_:
         user = await super().convert(ctx, value)
 
-        try:
-            return await Player_.from_id(user.id, ctx.bot.pg)
-        except UnknownPlayer:
+        # commands usually need author player too, fetch both in one query
+        players = await ctx.get_players(user.id, ctx.author.id)
+
+        player = players.get(user.id)
+        if player is None:
             raise ConvertError(value, self, f"У **{user}** нет персонажа")
+
+        return player
@@ -18,6 +18,22 @@ class TooFewArguments(ParserError):
         return "Команде передано недостаточно аргументов"
 
 
+class TokenizeError(ParserError):
+    def __init__(self, text: str, position: int) -> None:
+        super().__init__(text, position)
+
+        self.text = text
+        self.position = position
+
+    def __str__(self) -> str:
+        if self.text[self.position] == "\\":
+            problem = "Экранирующий символ в конце строки"
+        else:
+            problem = "Незакрытая кавычка"
+
+        return f"{problem} (позиция {self.position + 1})"
+
+
 class ConvertError(ParserError):
     def __init__(self, value: Any, converter: "Converter", message: str = "") -> None:
         super().__init__(message)
@@ -1,11 +1,26 @@
 import os
-import re
 import asyncio
 
-from shlex import split
-from typing import TYPE_CHECKING, Set, Dict, Tuple, Pattern, Iterator, Optional
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Callable,
+    Iterator,
+    Optional,
+    Awaitable,
+    FrozenSet,
+    AsyncIterator,
+)
 from asyncio import CancelledError
 from logging import getLogger
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 
 import discord
 
@@ -15,6 +30,7 @@ from constants import COMMANDS_DIR
 
 from .command import Command, CommandResult, StopCommandExecution
 from .context import Context
+from .prefixes import PrefixStore, PrefixMatcher, SeparatedContent
 from .arguments import Arguments
 from .exceptions import ParserError
 
@@ -23,31 +39,256 @@ if TYPE_CHECKING:
 
 log = getLogger(__name__)
 
-PREFIX_REGEX = r"^(?P<prefix>({prefixes}))\s*(?P<command>\w+)(?:\s+(?P<arguments>.+))?$"
+# maximum number of commands being loaded at the same time
+COMMAND_LOAD_CONCURRENCY = 8
+
+# maximum number of commands running at the same time
+MAX_RUNNING_COMMANDS = 64
+# maximum number of commands waiting for execution
+MAX_QUEUED_COMMANDS = 256
+# maximum number of waiting and running commands of a single user
+USER_QUEUE_SIZE = 3
+
+_LockType = Union[asyncio.Lock, asyncio.Semaphore]
+
+# releases all slots, or all except command concurrency slot if flag is set
+ReleaseSlotType = Callable[[bool], Awaitable[None]]
+
+# scheduler slots held by current command, nested invocations (runas) skip them
+_held_slots: "ContextVar[FrozenSet[str]]" = ContextVar(
+    "held_slots", default=frozenset()
+)
 
 
 class CommandCheckError(Exception):
     pass
 
 
+class SchedulerFull(Exception):
+    pass
+
+
+class CommandScheduler:
+    """
+    Limits command execution.
+
+    Commands of the same user run one after another, so they never race each
+    other. Commands can declare concurrency limit in configuration. Total number
+    of running commands is limited too. Commands are rejected with SchedulerFull
+    when user or global queue is full.
+
+    Slots are released before waiting for user input (paginators,
+    confirmations). Changes made after that are only protected by Postgres
+    constraints and transactions. Commands holding resources while waiting
+    keep their concurrency slot.
+    """
+
+    GLOBAL_SLOT = "global"
+
+    def __init__(
+        self,
+        *,
+        max_running: int = MAX_RUNNING_COMMANDS,
+        max_queued: int = MAX_QUEUED_COMMANDS,
+        user_queue_size: int = USER_QUEUE_SIZE,
+    ):
+        self._running_semaphore = asyncio.Semaphore(max_running)
+        self._max_queued = max_queued
+        self._user_queue_size = user_queue_size
+
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        # number of waiting and running commands of each user
+        self._user_pending: Dict[int, int] = {}
+        # command name: (limit, semaphore)
+        self._command_semaphores: Dict[str, Tuple[int, asyncio.Semaphore]] = {}
+
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _get_command_semaphore(self, command: Command) -> asyncio.Semaphore:
+        limit = command.concurrency
+        assert limit is not None
+
+        existing = self._command_semaphores.get(command.name)
+        if existing is not None and existing[0] == limit:
+            return existing[1]
+
+        # limit was changed by reload, running commands keep old semaphore
+        semaphore = asyncio.Semaphore(limit)
+        self._command_semaphores[command.name] = (limit, semaphore)
+
+        return semaphore
+
+    def _get_locks(self, user_id: int, command: Command) -> List[Tuple[str, _LockType]]:
+        held = _held_slots.get()
+        locks: List[Tuple[str, _LockType]] = []
+
+        # always acquired in this order to avoid deadlocks
+        user_slot = f"user:{user_id}"
+        if user_slot not in held:
+            if self._user_pending.get(user_id, 0) >= self._user_queue_size:
+                self.rejected += 1
+
+                raise SchedulerFull("Слишком много ваших команд в очереди")
+
+            locks.append(
+                (user_slot, self._user_locks.setdefault(user_id, asyncio.Lock()))
+            )
+
+        command_slot = f"command:{command.name}"
+        if command.concurrency is not None and command_slot not in held:
+            locks.append((command_slot, self._get_command_semaphore(command)))
+
+        if self.GLOBAL_SLOT not in held:
+            locks.append((self.GLOBAL_SLOT, self._running_semaphore))
+
+        if locks and self.queued >= self._max_queued:
+            self.rejected += 1
+
+            raise SchedulerFull("Бот перегружен, попробуйте позже")
+
+        return locks
+
+    def _record_wait(self, wait_time: float) -> None:
+        self.wait_count += 1
+        self.wait_total += wait_time
+        self.wait_max = max(self.wait_max, wait_time)
+
+    def _forget_user(self, user_id: int) -> None:
+        pending = self._user_pending[user_id] - 1
+        if pending:
+            self._user_pending[user_id] = pending
+        else:
+            del self._user_pending[user_id]
+            del self._user_locks[user_id]
+
+    @asynccontextmanager
+    async def slot(
+        self, user_id: int, command: Command
+    ) -> AsyncIterator[ReleaseSlotType]:
+        """
+        Wait until command can run. Raises SchedulerFull.
+
+        Yields function releasing slots early. Commands waiting for user input
+        call it, so they do not block other commands while waiting. Commands
+        holding resources during wait can keep their concurrency slot.
+        """
+
+        locks = self._get_locks(user_id, command)
+        slots = frozenset(slot for slot, _ in locks)
+        counts_for_user = f"user:{user_id}" in slots
+
+        if counts_for_user:
+            self._user_pending[user_id] = self._user_pending.get(user_id, 0) + 1
+
+        acquired: List[Tuple[str, _LockType]] = []
+
+        self.queued += 1
+        start = perf_counter()
+
+        try:
+            for slot, lock in locks:
+                await lock.acquire()
+                acquired.append((slot, lock))
+        except BaseException:
+            for _, lock in reversed(acquired):
+                lock.release()
+
+            if counts_for_user:
+                self._forget_user(user_id)
+
+            raise
+        finally:
+            self.queued -= 1
+
+        self._record_wait(perf_counter() - start)
+
+        token = _held_slots.set(_held_slots.get() | slots)
+        self.running += 1
+
+        command_slot = f"command:{command.name}"
+        running = True
+
+        async def release(keep_command_slot: bool = False) -> None:
+            nonlocal running
+
+            released = frozenset(
+                slot
+                for slot, _ in acquired
+                if not (keep_command_slot and slot == command_slot)
+            )
+
+            for slot, lock in reversed(acquired):
+                if slot in released:
+                    lock.release()
+
+            acquired[:] = [(s, lock) for s, lock in acquired if s not in released]
+
+            # nested invocations have to acquire released slots again
+            _held_slots.set(_held_slots.get() - released)
+
+            if running:
+                running = False
+
+                self.running -= 1
+
+                if counts_for_user:
+                    self._forget_user(user_id)
+
+        try:
+            yield release
+        finally:
+            await release()
+            _held_slots.reset(token)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "queued_users": len(self._user_pending),
+            "rejected": self.rejected,
+            "wait_avg_ms": round(
+                self.wait_total / self.wait_count * 1000 if self.wait_count else 0
+            ),
+            "wait_max_ms": round(self.wait_max * 1000),
+        }
+
+    def __repr__(self) -> str:
+        stats = " ".join(f"{k}={v}" for k, v in self.stats.items())
+
+        return f"<CommandScheduler {stats}>"
+
+
 class Handler:
     def __init__(self, bot: "TarakaniaRPG"):
         self.bot = bot
 
-        self._custom_prefixes: Dict[int, str] = {}
+        self.prefixes: Optional[PrefixMatcher] = None
+        self.prefix_store: Optional[PrefixStore] = None
         self._commands: Dict[str, Command] = {}
 
         self._running_commands: Dict[int, asyncio.Task[CommandResult]] = {}
 
-    async def load_command(
+        self.scheduler = CommandScheduler()
+
+    async def _load_command(
         self, command_path: str, raise_on_error: bool = False
     ) -> Optional[Command]:
-        """Load a single command."""
+        """Load and initialize a single command without registering it."""
 
         log.debug(f"Loading {command_path}")
 
         try:
-            command = Command(self.bot, command_path)
+            # configuration parsing and module import are blocking
+            command = await self.bot.loop.run_in_executor(
+                None, Command, self.bot, command_path
+            )
             await command.init()
         except Exception:
             log.exception(f"Error loading {command_path}")
@@ -57,9 +298,21 @@ class Handler:
 
             return None
 
+        return command
+
+    def _register_command(self, command: Command) -> None:
         for alias in command.aliases:
             self._commands[alias] = command
 
+    async def load_command(
+        self, command_path: str, raise_on_error: bool = False
+    ) -> Optional[Command]:
+        """Load a single command."""
+
+        command = await self._load_command(command_path, raise_on_error=raise_on_error)
+        if command is not None:
+            self._register_command(command)
+
         return command
 
     async def reload_command(
@@ -92,10 +345,43 @@ class Handler:
     async def load_all_commands(self) -> None:
         log.info("Started loading commands")
 
-        for command_path in self._iterate_command_configurations():
-            await self.load_command(command_path)
+        semaphore = asyncio.Semaphore(COMMAND_LOAD_CONCURRENCY)
+        load_times: Dict[str, float] = {}
 
-        log.info(f"Loaded commands with {len(self._commands)} aliases")
+        async def load(command_path: str) -> Optional[Command]:
+            async with semaphore:
+                start = perf_counter()
+                command = await self._load_command(command_path)
+                load_times[command_path] = perf_counter() - start
+
+            return command
+
+        start = perf_counter()
+
+        command_paths = list(self._iterate_command_configurations())
+        commands: List[Optional[Command]] = await asyncio.gather(
+            *(load(path) for path in command_paths)
+        )
+
+        total_time = perf_counter() - start
+
+        # register in walk order to keep alias conflicts resolution stable
+        for command in commands:
+            if command is not None:
+                self._register_command(command)
+
+        log.info(
+            f"Loaded commands with {len(self._commands)} aliases "
+            f"in {round(total_time * 1000)}ms"
+        )
+
+        report = ", ".join(
+            f"{path} {round(load_time * 1000)}ms"
+            for path, load_time in sorted(
+                load_times.items(), key=lambda x: x[1], reverse=True
+            )
+        )
+        log.info(f"Command load times: {report}")
 
     @staticmethod
     def _iterate_command_configurations() -> Iterator[str]:
@@ -108,20 +394,8 @@ class Handler:
                     yield relative_path[:-5]
 
     async def prepare_prefixes(self) -> None:
-        bot_id = self.bot.user.id
-
-        prefixes = (
-            re.escape(self.bot.config["default-prefix"]),
-            fr"<@{bot_id}>",
-            fr"<@!{bot_id}>",
-        )
-
-        self._prefixes_regex = re.compile(
-            PREFIX_REGEX.format(prefixes="|".join(prefixes)), re.IGNORECASE | re.UNICODE
-        )
-        self._dm_prefixes_regex = re.compile(
-            PREFIX_REGEX.format(prefixes="|".join(prefixes + ("",))),
-            re.IGNORECASE | re.UNICODE,
+        self.prefixes = PrefixMatcher(
+            self.bot.config["default-prefix"], self.bot.user.id
         )
 
         await self.prepare_custom_prefixes()
@@ -129,52 +403,43 @@ class Handler:
         log.debug("Prepareded prefixes")
 
     async def prepare_custom_prefixes(self) -> None:
-        # TODO
+        if self.prefixes is None:
+            raise RuntimeError("Prefixes are not prepared")
 
-        pass
+        self.prefix_store = PrefixStore(self.prefixes, self.bot.pg, self.bot.redis)
 
-    def separate_prefix(
-        self, content: str, guild_id: Optional[int]
-    ) -> Tuple[Optional[str], Optional[str], str]:
-        """Split content into prefix, command, arguments."""
+        await self.prefix_store.start()
 
-        def regex_match(
-            expr: Pattern[str], content: str
-        ) -> Tuple[Optional[str], Optional[str], str]:
-            match = expr.search(content)
-            if match is None:
-                return None, None, content
-
-            return (
-                match.group("prefix"),
-                match.group("command"),
-                match.group("arguments") or "",
-            )
+    def stop(self) -> None:
+        """Stop background tasks of handler."""
 
-        if guild_id is None:
-            return regex_match(self._dm_prefixes_regex, content)
+        if self.prefix_store is not None:
+            self.prefix_store.stop()
 
-        custom_prefix = self._custom_prefixes.get(guild_id)
-        if custom_prefix is None:
-            return regex_match(self._prefixes_regex, content)
+    async def set_custom_prefix(self, guild_id: int, prefix: Optional[str]) -> None:
+        """Change guild prefix in all processes. None resets it to default."""
 
-        lower_content = content.lower()
-        if lower_content.startswith(custom_prefix):
-            command_and_arguments = content[len(custom_prefix) :].split(maxsplit=1)
-            return (
-                custom_prefix,
-                command_and_arguments[0],
-                command_and_arguments[1] if len(command_and_arguments) == 2 else "",
-            )
+        if self.prefix_store is None:
+            raise RuntimeError("Prefixes are not prepared")
 
-        return None, None, content
+        await self.prefix_store.set(guild_id, prefix)
+
+    def separate_prefix(
+        self, content: str, guild_id: Optional[int]
+    ) -> SeparatedContent:
+        """Split content into prefix, command, arguments."""
+
+        if self.prefixes is None:
+            return None, None, content
+
+        return self.prefixes.split(content, guild_id)
 
     async def process_message(self, msg: discord.Message) -> None:
         if msg.author.bot:
             return
 
         if not self._commands:
-            # not initialized, avoid errors because of missing regex variables
+            # not initialized
             return
 
         used_prefix, used_alias, arguments = self.separate_prefix(
@@ -187,14 +452,6 @@ class Handler:
         if command is None:
             return
 
-        try:
-            splitted_args = split(arguments)
-        except ValueError:
-            # TODO: better help message
-            await msg.channel.send("Ошибка разделения аргументов: открытая ковычка")
-
-            return
-
         with configure_scope() as scope:
             scope.user = {"id": msg.author.id, "tag": str(msg.author)}
             scope.set_tag("message_id", msg.id)
@@ -206,30 +463,24 @@ class Handler:
                 scope.set_tag("guild_id", msg.guild.id)
                 scope.set_tag("channel_id", msg.channel.id)
 
-        args = Arguments(splitted_args)
         ctx = Context(self.bot, msg, command, used_prefix, used_alias)
 
         try:
             await self._run_command_checks(ctx)
-            await args.convert(ctx, command.arguments)
+
+            args = Arguments.from_string(arguments, command.flags)
         except (CommandCheckError, ParserError) as e:
             return await self._process_response(
-                f"Ошибка при обработке команды **{command.name}**: {e}\n"
-                f"Правила вызова команды: `{await command.get_usage(ctx)}`",
-                ctx,
+                await self._format_parser_error(ctx, e), ctx
             )
 
-        log.debug(
-            f"{command.name} <- {ctx.author.id}"
-            f"[{f'{ctx.guild.id}-{ctx.channel.id}' if ctx.guild else 'DM'}]"
-        )
-
         try:
-            task = asyncio.create_task(command.run(ctx, args))
+            # waiting in queue is part of task, edit or deletion cancels it
+            task = asyncio.create_task(self._execute(ctx, args))
             self._running_commands[msg.id] = task
 
             response = await task
-        except StopCommandExecution as e:
+        except (SchedulerFull, StopCommandExecution) as e:
             response = str(e)
         except CancelledError:
             log.debug(f"Cancelled execution of {command.name} (CancelledError)")
@@ -246,6 +497,32 @@ class Handler:
 
         await self._process_response(response, ctx)
 
+    async def _execute(self, ctx: Context, args: Arguments) -> CommandResult:
+        async with self.scheduler.slot(ctx.author.id, ctx.command) as release:
+            ctx._release_slots = release
+
+            # conversion is done in slot, loaded players are not changed by
+            # other commands of the same user
+            try:
+                await args.convert(ctx, ctx.command.arguments)
+            except ParserError as e:
+                return await self._format_parser_error(ctx, e)
+
+            log.debug(
+                f"{ctx.command.name} <- {ctx.author.id}"
+                f"[{f'{ctx.guild.id}-{ctx.channel.id}' if ctx.guild else 'DM'}]"
+            )
+
+            return await ctx.command.run(ctx, args)
+
+    async def _format_parser_error(
+        self, ctx: Context, e: Union[CommandCheckError, ParserError]
+    ) -> str:
+        return (
+            f"Ошибка при обработке команды **{ctx.command.name}**: {e}\n"
+            f"Правила вызова команды: `{await ctx.command.get_usage(ctx)}`"
+        )
+
     async def _run_command_checks(self, ctx: Context) -> None:
         if ctx.command.guild_only and ctx.guild is None:
             raise CommandCheckError(
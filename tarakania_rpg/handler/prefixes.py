@@ -0,0 +1,228 @@
+import re
+import asyncio
+
+from typing import TYPE_CHECKING, Dict, Tuple, Pattern, Optional
+from logging import getLogger
+
+import aioredis
+
+from db.redis import REDIS_ERRORS
+
+if TYPE_CHECKING:
+    import asyncpg
+
+    from db.redis import _ConnectionsPool
+
+log = getLogger(__name__)
+
+# anchored at the start of content. Arguments are not part of expression: they
+# are sliced after match, so long messages are never scanned or backtracked
+PREFIX_REGEX = r"(?P<prefix>{prefixes})\s*(?P<command>\w+)(?:\s+|\Z)"
+
+SeparatedContent = Tuple[Optional[str], Optional[str], str]
+
+MAX_PREFIX_LENGTH = 32
+
+# redis channel for ids of guilds with changed prefixes
+PREFIX_CHANNEL = "guild_prefixes"
+RESUBSCRIBE_INTERVAL = 5
+
+
+class PrefixMatcher:
+    """
+    Splits message content into prefix, command and arguments.
+
+    Each prefix set is compiled into anchored expression. Most messages are not
+    commands, they are rejected by the first character check of regex engine.
+
+    Guilds with custom prefix do not accept default prefix. Mention prefixes
+    are accepted everywhere, empty prefix is allowed in DMs.
+    """
+
+    __slots__ = ("_default", "_mentions", "_regex", "_dm_regex", "_custom", "_regexes")
+
+    def __init__(self, default_prefix: str, bot_id: int):
+        self._default = default_prefix.lower()
+        self._mentions = (f"<@{bot_id}>", f"<@!{bot_id}>")
+
+        self._regex = self._compile(self._default)
+        self._dm_regex = self._compile(self._default, "")
+
+        # guild id: (lowercase prefix, compiled expression)
+        self._custom: Dict[int, Tuple[str, Pattern[str]]] = {}
+        # popular prefixes are shared by many guilds, compile each once
+        self._regexes: Dict[str, Pattern[str]] = {}
+
+    def _compile(self, *prefixes: str) -> Pattern[str]:
+        # empty prefix should go last, it matches anything
+        alternatives = [re.escape(p) for p in self._mentions + prefixes]
+
+        return re.compile(
+            PREFIX_REGEX.format(prefixes="|".join(alternatives)),
+            re.IGNORECASE | re.UNICODE,
+        )
+
+    @property
+    def default_prefix(self) -> str:
+        return self._default
+
+    def get_custom_prefix(self, guild_id: int) -> Optional[str]:
+        custom = self._custom.get(guild_id)
+
+        return None if custom is None else custom[0]
+
+    def set_custom_prefix(self, guild_id: int, prefix: str) -> None:
+        prefix = prefix.lower()
+
+        regex = self._regexes.get(prefix)
+        if regex is None:
+            regex = self._regexes[prefix] = self._compile(prefix)
+
+        self._custom[guild_id] = (prefix, regex)
+
+    def remove_custom_prefix(self, guild_id: int) -> None:
+        self._custom.pop(guild_id, None)
+
+    def clear_custom_prefixes(self) -> None:
+        self._custom.clear()
+
+    def split(self, content: str, guild_id: Optional[int]) -> SeparatedContent:
+        """
+        Split content into prefix, command, arguments. Prefix and command are
+        None if content is not a command.
+        """
+
+        if guild_id is None:
+            regex = self._dm_regex
+        else:
+            custom = self._custom.get(guild_id)
+            regex = self._regex if custom is None else custom[1]
+
+        match = regex.match(content)
+        if match is None:
+            return None, None, content
+
+        return match.group("prefix"), match.group("command"), content[match.end() :]
+
+
+class PrefixStore:
+    """
+    Custom guild prefixes stored in Postgres.
+
+    All prefixes are loaded into matcher at startup with a single query. Changes
+    are announced through redis channel, every process reloads changed prefix
+    from Postgres when it receives guild id.
+    """
+
+    __slots__ = ("_matcher", "_pg", "_redis", "_listener_task")
+
+    def __init__(
+        self,
+        matcher: PrefixMatcher,
+        pg: "asyncpg.pool.Pool",
+        redis: "_ConnectionsPool",
+    ):
+        self._matcher = matcher
+        self._pg = pg
+        self._redis = redis
+
+        self._listener_task: Optional[asyncio.Task[None]] = None
+
+    async def load_all(self) -> None:
+        records = await self._pg.fetch("SELECT guild_id, prefix FROM guild_prefixes")
+
+        self._matcher.clear_custom_prefixes()
+
+        for record in records:
+            self._matcher.set_custom_prefix(record["guild_id"], record["prefix"])
+
+        log.debug(f"Loaded {len(records)} custom prefixes")
+
+    async def _reload(self, guild_id: int) -> None:
+        prefix = await self._pg.fetchval(
+            "SELECT prefix FROM guild_prefixes WHERE guild_id = $1", guild_id
+        )
+
+        if prefix is None:
+            self._matcher.remove_custom_prefix(guild_id)
+        else:
+            self._matcher.set_custom_prefix(guild_id, prefix)
+
+    async def set(self, guild_id: int, prefix: Optional[str]) -> None:
+        """Set custom guild prefix. None resets prefix to default."""
+
+        if prefix is None:
+            await self._pg.execute(
+                "DELETE FROM guild_prefixes WHERE guild_id = $1", guild_id
+            )
+            self._matcher.remove_custom_prefix(guild_id)
+        else:
+            prefix = prefix.strip().lower()
+            if not prefix:
+                raise ValueError("Custom prefix should not be empty")
+
+            await self._pg.execute(
+                "INSERT INTO guild_prefixes (guild_id, prefix) VALUES ($1, $2) "
+                "ON CONFLICT (guild_id) DO UPDATE SET prefix = EXCLUDED.prefix",
+                guild_id,
+                prefix,
+            )
+            self._matcher.set_custom_prefix(guild_id, prefix)
+
+        try:
+            await self._redis.execute("PUBLISH", PREFIX_CHANNEL, guild_id)
+        except REDIS_ERRORS as e:
+            # other processes catch up after resubscribing
+            log.warning(f"Unable to announce prefix change of {guild_id}: {e!r}")
+
+    async def start(self) -> None:
+        """
+        Load all prefixes and listen for changes. Channel is subscribed before
+        loading, so changes made during loading are not missed.
+        """
+
+        if self._listener_task is not None:
+            return
+
+        redis = aioredis.Redis(self._redis)
+
+        channel: Optional[aioredis.Channel]
+        try:
+            (channel,) = await redis.subscribe(PREFIX_CHANNEL)
+        except REDIS_ERRORS as e:
+            log.warning(f"Unable to subscribe to prefix channel: {e!r}")
+
+            channel = None
+
+        await self.load_all()
+
+        self._listener_task = asyncio.create_task(self._listener(redis, channel))
+
+    def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            self._listener_task = None
+
+    async def _listener(
+        self, redis: aioredis.Redis, channel: Optional[aioredis.Channel]
+    ) -> None:
+        while True:
+            try:
+                if channel is None:
+                    (channel,) = await redis.subscribe(PREFIX_CHANNEL)
+
+                    # changes could be missed while connection was lost
+                    await self.load_all()
+
+                while await channel.wait_message():
+                    await self._reload(int(await channel.get()))
+            except asyncio.CancelledError:
+                raise
+            except REDIS_ERRORS as e:
+                log.warning(f"Prefix channel subscription lost: {e!r}")
+            except Exception:
+                log.exception("Error processing prefix change")
+
+            channel = None
+
+            await asyncio.sleep(RESUBSCRIBE_INTERVAL)
@@ -0,0 +1,180 @@
+import asyncio
+
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
+from logging import getLogger
+
+from db.redis import REDIS_ERRORS
+
+if TYPE_CHECKING:
+    from db.redis import _ConnectionsPool
+
+log = getLogger(__name__)
+
+CACHE_TTL = 86400  # 24 hours
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+# maximum time to wait for responses of message to be written
+FLUSH_TIMEOUT = 5
+
+# entries and expiration are set atomically, key without TTL is never left
+PUSH_SCRIPT = """
+redis.call('RPUSH', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+"""
+
+
+class ResponseTracker:
+    """
+    Buffers message responses and writes them to redis in background.
+
+    Entries are grouped by message and sent in pipelined batches. When queue is
+    full, register waits for free space.
+
+    Number of queued entries is tracked for each message, so flush only waits
+    for entries of a single message.
+    """
+
+    __slots__ = (
+        "_redis",
+        "_queue",
+        "_batch_size",
+        "_writer_task",
+        "_pending",
+        "_flushed",
+    )
+
+    def __init__(
+        self,
+        redis: "_ConnectionsPool",
+        *,
+        queue_size: int = QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self._redis = redis
+        self._queue: asyncio.Queue[Tuple[int, str]] = asyncio.Queue(queue_size)
+        self._batch_size = batch_size
+
+        self._writer_task: Optional[asyncio.Task[None]] = None
+
+        # message id: number of queued entries
+        self._pending: Dict[int, int] = {}
+        # message id: event set when all queued entries are written
+        self._flushed: Dict[int, asyncio.Event] = {}
+
+    @staticmethod
+    def address(message_id: int) -> str:
+        return f"message_responses:{message_id}"
+
+    def start(self) -> None:
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._writer())
+
+    def stop(self) -> None:
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            self._writer_task = None
+
+    async def register(self, message_id: int, entry: str) -> None:
+        """Queue response entry for message. Skipped if redis is unavailable."""
+
+        if self._redis.degraded:
+            return
+
+        self._pending[message_id] = self._pending.get(message_id, 0) + 1
+
+        try:
+            self._queue.put_nowait((message_id, entry))
+        except asyncio.QueueFull:
+            log.warning("Response queue is full, waiting for writer")
+
+            try:
+                await self._queue.put((message_id, entry))
+            except BaseException:
+                self._done(message_id, 1)
+
+                raise
+
+    def _done(self, message_id: int, count: int) -> None:
+        pending = self._pending[message_id] - count
+        if pending:
+            self._pending[message_id] = pending
+
+            return
+
+        del self._pending[message_id]
+
+        event = self._flushed.pop(message_id, None)
+        if event is not None:
+            event.set()
+
+    async def flush(self, message_id: int, timeout: float = FLUSH_TIMEOUT) -> None:
+        """
+        Wait until entries of message queued before this call are written.
+        Gives up after timeout.
+        """
+
+        if message_id not in self._pending or self._writer_task is None:
+            return
+
+        event = self._flushed.get(message_id)
+        if event is None:
+            event = self._flushed[message_id] = asyncio.Event()
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Responses of {message_id} were not written in {timeout}s")
+
+    def _get_batch(self, first: Tuple[int, str]) -> List[Tuple[int, str]]:
+        batch = [first]
+
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+        return batch
+
+    async def _write(self, batch: List[Tuple[int, str]]) -> None:
+        entries: Dict[int, List[str]] = {}
+        for message_id, entry in batch:
+            entries.setdefault(message_id, []).append(entry)
+
+        # commands are pipelined
+        await asyncio.gather(
+            *(
+                self._redis.execute(
+                    "EVAL",
+                    PUSH_SCRIPT,
+                    1,
+                    self.address(message_id),
+                    CACHE_TTL,
+                    *message_entries,
+                )
+                for message_id, message_entries in entries.items()
+            )
+        )
+
+    async def _writer(self) -> None:
+        while True:
+            batch = self._get_batch(await self._queue.get())
+
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                raise
+            except REDIS_ERRORS as e:
+                log.warning(f"Dropped {len(batch)} responses: {e.__class__.__name__}")
+            except Exception:
+                log.exception(f"Error writing {len(batch)} responses")
+            finally:
+                counts: Dict[int, int] = {}
+                for message_id, _ in batch:
+                    counts[message_id] = counts.get(message_id, 0) + 1
+
+                    self._queue.task_done()
+
+                for message_id, count in counts.items():
+                    self._done(message_id, count)
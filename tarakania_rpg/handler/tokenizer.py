@@ -0,0 +1,96 @@
+"""
+Argument tokenizer compatible with POSIX mode of shlex.split, except that any
+unicode whitespace separates words.
+
+Words are found with a single regex pass. Only words containing quotes or
+backslashes are processed further, plain words are used as is.
+"""
+
+import re
+
+from typing import Dict, List, Tuple, Union, AbstractSet
+
+from .exceptions import TokenizeError
+
+FlagsType = Dict[str, Union[str, bool]]
+
+# sequence of bare parts, quoted parts and escaped characters. Anything else
+# at word start is an unclosed quote or trailing backslash
+WORD_REGEX = re.compile(
+    r"""(?:[^\s"'\\]+|"(?:[^"\\]|\\.)*"|'[^']*'|\\.)+|(?P<error>\S)""", re.DOTALL
+)
+PART_REGEX = re.compile(
+    r"""[^"'\\]+|"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>[^']*)'|\\(?P<escaped>.)""",
+    re.DOTALL,
+)
+# inside double quotes backslash only escapes quote and itself
+DOUBLE_QUOTED_ESCAPE_REGEX = re.compile(r"""\\(["\\])""")
+
+# text without special characters, no processing needed
+PLAIN_TEXT_REGEX = re.compile(r"""[^"'\\]*\Z""")
+
+FLAG_PREFIX = "--"
+
+
+def _unquote(word: str) -> str:
+    if PLAIN_TEXT_REGEX.match(word):
+        return word
+
+    parts = []
+    for match in PART_REGEX.finditer(word):
+        double, single, escaped = match.group("double", "single", "escaped")
+
+        if double is not None:
+            parts.append(DOUBLE_QUOTED_ESCAPE_REGEX.sub(r"\1", double))
+        elif single is not None:
+            parts.append(single)
+        elif escaped is not None:
+            parts.append(escaped)
+        else:
+            parts.append(match.group())
+
+    return "".join(parts)
+
+
+def tokenize(
+    text: str, flag_names: AbstractSet[str] = frozenset()
+) -> Tuple[List[str], FlagsType]:
+    """
+    Split text into words and flags.
+
+    Unquoted words --name and --name=value are flags if name is in flag_names,
+    otherwise they are kept as words. Everything after -- is treated as words if
+    command has flags.
+
+    Raises TokenizeError with position of unclosed quote or trailing backslash.
+    """
+
+    words: List[str] = []
+    flags: FlagsType = {}
+
+    parse_flags = bool(flag_names)
+
+    if not parse_flags and PLAIN_TEXT_REGEX.match(text):
+        return text.split(), flags
+
+    for match in WORD_REGEX.finditer(text):
+        if match.group("error") is not None:
+            raise TokenizeError(text, match.start())
+
+        word = match.group()
+
+        if parse_flags and word.startswith(FLAG_PREFIX):
+            if word == FLAG_PREFIX:
+                parse_flags = False
+
+                continue
+
+            name, separator, value = word[len(FLAG_PREFIX) :].partition("=")
+            if name in flag_names:
+                flags[name] = _unquote(value) if separator else True
+
+                continue
+
+        words.append(_unquote(word))
+
+    return words, flags
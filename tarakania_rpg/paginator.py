@@ -55,6 +55,7 @@ class _PaginatorBase:
         "_timeout",
         "_timeout_modifier",
         "_cache_pages",
+        "_keep_command_slot",
         "_pages",
         "_index",
         "_stopped",
@@ -77,6 +78,7 @@ class _PaginatorBase:
         timeout: float = 50,
         timeout_modifier: float = 20,
         cache_pages: bool = True,
+        keep_command_slot: bool = False,
     ) -> None:
         if size < 0:
             raise ValueError("Paginator size should not be lower than 0")
@@ -85,6 +87,8 @@ class _PaginatorBase:
         self._timeout = timeout
         self._timeout_modifier = timeout_modifier
         self._cache_pages = cache_pages
+        # set by commands holding resources while paginator runs
+        self._keep_command_slot = keep_command_slot
 
         self._pages: List[Optional[PageType]]
         if cache_pages:
@@ -243,6 +247,9 @@ class _PaginatorBase:
 
         self._check_permissions(message.channel)
 
+        # user can take a minute to switch pages, other commands should not wait
+        await ctx.release_slots(keep_command_slot=self._keep_command_slot)
+
         await self._init_reactions()
 
         start_time = time()
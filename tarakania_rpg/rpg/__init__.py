@@ -1,7 +1,11 @@
+from utils.xp import XPCurve, set_curve
+from constants import DATA_DIR
+
 from .race import Race
 from .items import load_all_items
 from .class_ import Class
 from .location import Location
+from .snapshot import load_file, save_snapshot
 
 
 def load_races() -> None:
@@ -16,9 +20,18 @@ def load_locations() -> None:
     Location._load_objects_from_file(Location)
 
 
+def load_xp_curve() -> None:
+    set_curve(XPCurve.from_data(load_file(f"{DATA_DIR}/rpg/xp_curve.yaml")))
+
+
 def load_objects() -> None:
+    load_xp_curve()
+
     load_races()
     load_classes()
     load_locations()
 
     load_all_items()
+
+    # store freshly parsed files for next startup
+    save_snapshot()
@@ -3,14 +3,16 @@ from __future__ import annotations
 from typing import Any, Dict
 
 from . import Item
+from ..stats import StatsVector, modifiers_vector
 
 
 class Equippable(Item):
 
-    __slots__ = ("modifiers",)
+    __slots__ = ("modifiers", "modifiers_vector")
 
     def __init__(self, **kwargs: Any):
         self.modifiers: Dict[str, int] = kwargs.pop("modifiers", {})
+        self.modifiers_vector: StatsVector = modifiers_vector(self.modifiers)
 
         super().__init__(**kwargs)
 
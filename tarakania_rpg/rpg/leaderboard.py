@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import uuid
+import asyncio
+
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Callable, Iterable, Optional
+from logging import getLogger
+from contextlib import suppress
+
+from utils.xp import xp_to_levels
+from db.redis import REDIS_ERRORS
+
+if TYPE_CHECKING:
+    import asyncpg
+
+    from db.redis import _ConnectionsPool
+
+log = getLogger(__name__)
+
+BOARDS = ("xp", "money", "level")
+
+KEY_PREFIX = "leaderboard"
+# discord id: nick, lets pages be rendered without Postgres
+NICKS_KEY = f"{KEY_PREFIX}:nicks"
+
+# number of players read from Postgres and written to redis at once
+REBUILD_BATCH_SIZE = 1000
+# number of member ids sent in a single SADD when building guild board
+GUILD_MEMBERS_CHUNK_SIZE = 1000
+# guild boards are not updated, they are built again after expiration
+GUILD_BOARD_TTL = 60
+
+# members set has no scores, scores are taken from board only. Board and its
+# expiration are set atomically, key without TTL is never left
+GUILD_BOARD_SCRIPT = """
+redis.call('ZINTERSTORE', KEYS[1], 2, KEYS[2], KEYS[3], 'WEIGHTS', 1, 0)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+"""
+
+# nick, xp, money. None for deleted players
+_EntryType = Optional[Tuple[str, int, int]]
+
+
+def board_key(board: str) -> str:
+    if board not in BOARDS:
+        raise ValueError(f"Unknown leaderboard: {board}")
+
+    return f"{KEY_PREFIX}:{board}"
+
+
+def guild_board_key(board: str, guild_id: int) -> str:
+    return f"{board_key(board)}:guild:{guild_id}"
+
+
+class Leaderboard:
+    """
+    Player rankings stored in redis sorted sets, one set for each board.
+
+    Postgres stays the source of truth, boards are rebuilt from it at startup.
+    Players are added to boards on creation and removed on deletion, xp and
+    money changes are picked up by rebuild. Updates that could not be written
+    are kept and sent with the next update.
+
+    Guild boards are intersections of global board with guild members. They
+    are built on first read and expire after GUILD_BOARD_TTL seconds.
+    """
+
+    __slots__ = ("_redis", "_pending", "_rebuild_changes")
+
+    def __init__(self) -> None:
+        self._redis: Optional[_ConnectionsPool] = None
+
+        self._pending: Dict[int, _EntryType] = {}
+        # changes made while rebuild is running, reapplied after it finishes
+        self._rebuild_changes: Optional[Dict[int, _EntryType]] = None
+
+    def set_redis(self, redis: _ConnectionsPool) -> None:
+        self._redis = redis
+
+    async def update(self, discord_id: int, nick: str, xp: int, money: int) -> None:
+        await self._put(discord_id, (nick, xp, money))
+
+    async def remove(self, discord_id: int) -> None:
+        await self._put(discord_id, None)
+
+    async def _put(self, discord_id: int, entry: _EntryType) -> None:
+        self._pending[discord_id] = entry
+        if self._rebuild_changes is not None:
+            self._rebuild_changes[discord_id] = entry
+
+        await self._flush()
+
+    async def _flush(self) -> None:
+        if self._redis is None or self._redis.degraded or not self._pending:
+            return
+
+        pending = self._pending
+        self._pending = {}
+
+        try:
+            await self._write(pending)
+        except REDIS_ERRORS as e:
+            log.warning(
+                f"Unable to update leaderboard of {len(pending)} players: {e!r}"
+            )
+
+            # newer entries could be added while writing
+            for discord_id, entry in pending.items():
+                self._pending.setdefault(discord_id, entry)
+
+    async def _write(
+        self, entries: Dict[int, _EntryType], keys: Optional[Dict[str, str]] = None
+    ) -> None:
+        assert self._redis is not None
+
+        if keys is None:
+            keys = {board: board_key(board) for board in BOARDS}
+
+        updated = [(i, e) for i, e in entries.items() if e is not None]
+        removed = [i for i, e in entries.items() if e is None]
+
+        commands: List[Tuple[Any, ...]] = []
+
+        if updated:
+            levels = xp_to_levels([e[1] for _, e in updated])
+
+            scores: Dict[str, List[Any]] = {board: [] for board in BOARDS}
+            nicks: List[Any] = []
+
+            for (discord_id, (nick, xp, money)), level in zip(updated, levels):
+                scores["xp"].extend((xp, discord_id))
+                scores["money"].extend((money, discord_id))
+                scores["level"].extend((level, discord_id))
+
+                nicks.extend((discord_id, nick))
+
+            commands.extend(("ZADD", keys[b], *scores[b]) for b in BOARDS)
+            commands.append(("HSET", keys.get("nicks", NICKS_KEY), *nicks))
+
+        if removed:
+            commands.extend(("ZREM", keys[b], *removed) for b in BOARDS)
+            commands.append(("HDEL", keys.get("nicks", NICKS_KEY), *removed))
+
+        await asyncio.gather(*(self._redis.execute(*c) for c in commands))
+
+    async def rebuild(self, pool: asyncpg.pool.Pool) -> None:
+        """
+        Rebuild all boards from Postgres. Players are streamed in batches into
+        temporary keys which replace boards when all players are written.
+        """
+
+        if self._redis is None:
+            raise RuntimeError("Redis is not set")
+
+        if self._rebuild_changes is not None:
+            log.warning("Leaderboard rebuild is already running")
+
+            return
+
+        token = uuid.uuid4().hex
+        keys = {board: f"{board_key(board)}:rebuild:{token}" for board in BOARDS}
+        keys["nicks"] = f"{NICKS_KEY}:rebuild:{token}"
+
+        self._rebuild_changes = {}
+        total = 0
+
+        try:
+            async with pool.acquire() as conn:
+                # server side cursors only exist inside transaction
+                async with conn.transaction():
+                    batch: Dict[int, _EntryType] = {}
+
+                    async for record in conn.cursor(
+                        "SELECT discord_id, nick, xp, money FROM players",
+                        prefetch=REBUILD_BATCH_SIZE,
+                    ):
+                        batch[record["discord_id"]] = (
+                            record["nick"],
+                            record["xp"],
+                            record["money"],
+                        )
+
+                        if len(batch) == REBUILD_BATCH_SIZE:
+                            await self._write(batch, keys)
+
+                            total += len(batch)
+                            batch = {}
+
+                    if batch:
+                        await self._write(batch, keys)
+
+                        total += len(batch)
+
+            if total:
+                await asyncio.gather(
+                    *(
+                        self._redis.execute("RENAME", tmp_key, live_key)
+                        for live_key, tmp_key in (
+                            *((board_key(b), keys[b]) for b in BOARDS),
+                            (NICKS_KEY, keys["nicks"]),
+                        )
+                    )
+                )
+            else:
+                await self._redis.execute(
+                    "DEL", NICKS_KEY, *(board_key(b) for b in BOARDS)
+                )
+        except BaseException:
+            with suppress(*REDIS_ERRORS):
+                await self._redis.execute("DEL", *keys.values())
+
+            raise
+        finally:
+            changes = self._rebuild_changes
+            self._rebuild_changes = None
+
+        # replaced boards could miss changes made during rebuild
+        for discord_id, entry in changes.items():
+            self._pending.setdefault(discord_id, entry)
+
+        await self._flush()
+
+        log.info(f"Rebuilt leaderboard of {total} players")
+
+    async def guild_key(
+        self, board: str, guild_id: int, get_member_ids: Callable[[], Iterable[int]]
+    ) -> str:
+        """
+        Get key of guild board, build it if it does not exist. Member ids are
+        only requested when board is built.
+        """
+
+        assert self._redis is not None
+
+        key = guild_board_key(board, guild_id)
+        if await self._redis.execute("EXISTS", key):
+            return key
+
+        ids = list(get_member_ids())
+        members_key = f"{key}:members:{uuid.uuid4().hex}"
+
+        try:
+            # chunks are sent without waiting for each other
+            await asyncio.gather(
+                *(
+                    self._redis.execute(
+                        "SADD", members_key, *ids[i : i + GUILD_MEMBERS_CHUNK_SIZE]
+                    )
+                    for i in range(0, len(ids), GUILD_MEMBERS_CHUNK_SIZE)
+                )
+            )
+
+            await self._redis.execute(
+                "EVAL",
+                GUILD_BOARD_SCRIPT,
+                3,
+                key,
+                board_key(board),
+                members_key,
+                GUILD_BOARD_TTL,
+            )
+        finally:
+            await self._redis.execute("DEL", members_key)
+
+        return key
+
+    async def count(self, key: str) -> int:
+        assert self._redis is not None
+
+        return await self._redis.execute("ZCARD", key)
+
+    async def page(self, key: str, start: int, count: int) -> List[Tuple[str, int]]:
+        """Get nicks and scores of players from start position, best first."""
+
+        assert self._redis is not None
+
+        data = await self._redis.execute(
+            "ZREVRANGE", key, start, start + count - 1, "WITHSCORES"
+        )
+        if not data:
+            return []
+
+        ids = data[::2]
+        scores = [int(float(s)) for s in data[1::2]]
+
+        nicks = await self._redis.execute("HMGET", NICKS_KEY, *ids)
+
+        return [
+            (f"<{i.decode()}>" if nick is None else nick.decode(), score)
+            for i, nick, score in zip(ids, nicks, scores)
+        ]
+
+    async def rank(self, key: str, discord_id: int) -> Optional[int]:
+        """Get 0 based position of player, None if player is not ranked."""
+
+        assert self._redis is not None
+
+        return await self._redis.execute("ZREVRANK", key, discord_id)
+
+
+leaderboard = Leaderboard()
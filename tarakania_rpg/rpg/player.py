@@ -1,23 +1,68 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Union, Iterator, Optional
+import asyncio
+
+from typing import Any, Dict, List, Tuple, Union, Iterable, Iterator, Optional, Sequence
+from collections import Counter
 
 import asyncpg
 
 from rpg.race import Race
 from utils.xp import level_to_xp, xp_to_level
 from rpg.items import Item, Armor, Weapon, Equippable
+from rpg.stats import (
+    MANA,
+    WILL,
+    HEALTH,
+    AGILITY,
+    STRENGTH,
+    VITALITY,
+    PROTECTION,
+    INTELLIGENCE,
+    ACTION_POINTS,
+    MAGIC_STRENGTH,
+    StatsVector,
+    sum_vectors,
+    calculate_stats,
+    calculate_stats_batch,
+)
 from rpg.class_ import Class
 from rpg.location import Location
-
-BASE_STAT_VALUE = 10
-BASE_ACTION_PONTS_VALUE = 4
-
-LEVEL_TO_STAT_RATIO = 15
-
-VITALITY_TO_HEALTH_RATIO = 20
-INTELLIGENCE_TO_MANA_RATIO = 20
-AGILITY_TO_ACTION_POINTS_RATIO = 0.1
+from rpg.leaderboard import leaderboard
+from rpg.player_cache import Generation, PlayerSnapshot, player_cache
+
+# rows contain both player and equipment columns, suitable for both arguments of
+# Player.from_data. asyncpg prepares statements and caches them per connection
+_SELECT_PLAYERS = (
+    "SELECT p.*, e.weapon, e.helmet, e.chestplate, e.leggings, e.boots, e.shield "
+    "FROM players p JOIN equipment e ON e.discord_id = p.discord_id "
+)
+SELECT_PLAYER_QUERY = f"{_SELECT_PLAYERS}WHERE p.discord_id = $1"
+SELECT_PLAYERS_QUERY = f"{_SELECT_PLAYERS}WHERE p.discord_id = ANY($1::bigint[])"
+
+# inventory is modified on server side, only changes are sent
+INVENTORY_ADD_QUERY = (
+    "UPDATE players SET inventory = inventory || $1::integer[] WHERE discord_id = $2"
+)
+INVENTORY_ADD_COUNT_QUERY = (
+    "UPDATE players "
+    "SET inventory = inventory || array_fill($1::integer, ARRAY[$2::integer]) "
+    "WHERE discord_id = $3"
+)
+# see inventory_remove function in schema.sql
+INVENTORY_REMOVE_QUERY = (
+    "UPDATE players SET inventory = inventory_remove(inventory, $1::integer[]) "
+    "WHERE discord_id = $2"
+)
+INVENTORY_REMOVE_COUNT_QUERY = (
+    "UPDATE players "
+    "SET inventory = inventory_remove("
+    "inventory, array_fill($1::integer, ARRAY[$2::integer])"
+    ") "
+    "WHERE discord_id = $3"
+)
+# see inventory_transfer function in schema.sql
+INVENTORY_TRANSFER_QUERY = "SELECT inventory_transfer($1, $2, $3, $4, $5)"
 
 
 class ItemNotFound(Exception):
@@ -49,11 +94,24 @@ class UnknownPlayer(Exception):
 
 
 class PlayerInventory:
+    """
+    Player inventory stored as item id to count mapping. Membership checks,
+    counting, additions and removals are O(1). Iteration yields every unit
+    separately, grouped by item.
+    """
+
+    __slots__ = ("_counts", "_size")
+
+    def __init__(self, *, items: Iterable[int]):
+        self._counts: Dict[int, int] = {}
+        self._size = 0
 
-    __slots__ = ("_items",)
+        for item_id, count in Counter(items).items():
+            # make sure item exists
+            Item.from_id(item_id)
 
-    def __init__(self, *, items: List[int]):
-        self._items: List[Item] = list(Item.from_id(i) for i in items)
+            self._counts[item_id] = count
+            self._size += count
 
     async def from_id(
         cls, discord_id: int, conn: asyncpg.Connection
@@ -71,29 +129,68 @@ class PlayerInventory:
     def from_data(cls, data: List[int]) -> PlayerInventory:
         return cls(items=data)
 
+    def to_data(self) -> List[int]:
+        data: List[int] = []
+        for item_id, count in self._counts.items():
+            data.extend([item_id] * count)
+
+        return data
+
     @property
     def size(self) -> int:
-        return len(self._items)
+        return self._size
 
     def get_count(self, item: Item) -> int:
 
-        return self._items.count(item)
+        return self._counts.get(item.id, 0)
 
-    async def _write_items(self, player: Player, pool: asyncpg.Pool) -> None:
-        await pool.fetch(
-            "UPDATE players SET inventory = $1 WHERE discord_id = $2",
-            [i.id for i in self._items],
-            player.discord_id,
-        )
+    def counts(self) -> Iterator[Tuple[Item, int]]:
+        """Iterate unique items with their counts."""
+
+        for item_id, count in self._counts.items():
+            yield Item.from_id(item_id), count
+
+    async def _check_counts(self, player: Player, counts: Dict[int, int]) -> None:
+        for item_id, count in counts.items():
+            if self._counts.get(item_id, 0) < count:
+                # local inventory could be outdated, next read loads it again
+                await player._invalidate_cache()
+
+                raise ItemNotFound
+
+    def _add(self, item_id: int, count: int = 1) -> None:
+        self._counts[item_id] = self._counts.get(item_id, 0) + count
+        self._size += count
+
+    def _remove(self, item_id: int, count: int = 1) -> None:
+        remaining = self._counts[item_id] - count
+        if remaining:
+            self._counts[item_id] = remaining
+        else:
+            del self._counts[item_id]
+
+        self._size -= count
+
+    async def _write_delta(
+        self, player: Player, pool: asyncpg.Pool, query: str, *args: Any
+    ) -> None:
+        try:
+            await pool.execute(query, *args, player.discord_id)
+        except asyncpg.NoDataFoundError:
+            # raised by inventory_remove, local inventory is outdated
+            await player._invalidate_cache()
+
+            raise ItemNotFound
 
     async def add(
         self, item: Item, player: Player, pool: asyncpg.Pool, count: int = 1
     ) -> Item:
 
-        for i in range(count):
-            self._items.append(item)
+        await self._write_delta(player, pool, INVENTORY_ADD_COUNT_QUERY, item.id, count)
+
+        self._add(item.id, count)
 
-        await self._write_items(player, pool)
+        await player._invalidate_cache()
 
         return item
 
@@ -101,13 +198,15 @@ class PlayerInventory:
         self, item: Item, player: Player, pool: asyncpg.Pool, count: int = 1
     ) -> Item:
 
-        if item not in self:
-            raise ItemNotFound
+        await self._check_counts(player, {item.id: count})
 
-        for i in range(count):
-            self._items.remove(item)
+        await self._write_delta(
+            player, pool, INVENTORY_REMOVE_COUNT_QUERY, item.id, count
+        )
+
+        self._remove(item.id, count)
 
-        await self._write_items(player, pool)
+        await player._invalidate_cache()
 
         return item
 
@@ -115,40 +214,50 @@ class PlayerInventory:
         self, items: List[Item], player: Player, pool: asyncpg.Pool
     ) -> None:
 
-        for item in items:
-            if item not in self:
-                raise ItemNotFound
+        counts = Counter(i.id for i in items)
 
-        for i in items:
-            self._items.remove(i)
+        await self._check_counts(player, counts)
+
+        await self._write_delta(
+            player, pool, INVENTORY_REMOVE_QUERY, [i.id for i in items]
+        )
+
+        for item_id, count in counts.items():
+            self._remove(item_id, count)
 
-        await self._write_items(player, pool)
+        await player._invalidate_cache()
 
     async def add_many(
         self, items: List[Item], player: Player, pool: asyncpg.Pool
     ) -> None:
 
+        await self._write_delta(
+            player, pool, INVENTORY_ADD_QUERY, [i.id for i in items]
+        )
+
         for i in items:
-            self._items.append(i)
+            self._add(i.id)
 
-        await self._write_items(player, pool)
+        await player._invalidate_cache()
 
     def __contains__(self, obj: object) -> bool:
         """Check if item is in player's inventory."""
 
         if isinstance(obj, int):
-            item: Item = Item.from_id(obj)
+            item_id = obj
         elif isinstance(obj, Item):
-            item = obj
+            item_id = obj.id
         else:
             return False
 
-        return item in self._items
+        return item_id in self._counts
 
     def __iter__(self) -> Iterator[Item]:
         """Iterate inventory items."""
 
-        yield from self._items
+        for item, count in self.counts():
+            for i in range(count):
+                yield item
 
 
 class PlayerEquipmnent:
@@ -214,6 +323,25 @@ class PlayerEquipmnent:
     def from_data(cls, data: Dict[str, Any]) -> PlayerEquipmnent:
         return cls(**{name: data[name] for name in cls._slots})
 
+    def to_data(self) -> Dict[str, Optional[int]]:
+        data: Dict[str, Optional[int]] = {}
+        for name in self._slots:
+            item = getattr(self, name)
+            data[name] = None if item is None else item.id
+
+        return data
+
+    @staticmethod
+    def get_slot_name(item: Equippable) -> str:
+        """Get name of slot item can be equipped to."""
+
+        if isinstance(item, Weapon):
+            return "weapon"
+        if isinstance(item, Armor):
+            return item.type
+
+        raise TypeError(f"No equipment slot for {item!r}")
+
     @staticmethod
     def can_equip(item: Union[int, Equippable], player: Player) -> bool:
         """Check if item can be equipped."""
@@ -235,12 +363,7 @@ class PlayerEquipmnent:
         if isinstance(item, int):
             item = Equippable.from_id(item)
 
-        if isinstance(item, Weapon):
-            slot_name = "weapon"
-        elif isinstance(item, Armor):
-            slot_name = item.type
-        else:
-            raise TypeError(f"Unable to equip {item!r}")
+        slot_name = self.get_slot_name(item)
 
         currently_equipped = getattr(self, slot_name)
 
@@ -258,6 +381,8 @@ class PlayerEquipmnent:
 
         setattr(self, slot_name, item)
 
+        await player._invalidate_cache()
+
         return currently_equipped
 
     async def unequip(
@@ -269,12 +394,7 @@ class PlayerEquipmnent:
         if item not in self:
             raise ItemAlreadyUnequipped
 
-        if isinstance(item, Weapon):
-            slot_name = "weapon"
-        elif isinstance(item, Armor):
-            slot_name = item.type
-        else:
-            raise TypeError(f"Unable to unequip {item!r}")
+        slot_name = self.get_slot_name(item)
 
         # f-string is safe here because slot_name is checked against _slots in
         # all scenarios
@@ -286,6 +406,8 @@ class PlayerEquipmnent:
 
         setattr(self, slot_name, None)
 
+        await player._invalidate_cache()
+
         return item
 
     def __contains__(self, obj: object) -> bool:
@@ -307,221 +429,83 @@ class PlayerEquipmnent:
 
 
 class PlayerStats:
+    """Stats are calculated in a single pass on first access."""
 
-    __slots__ = (
-        "_player_equipment",
-        "_player_level",
-        "_will",
-        "_agility",
-        "_strength",
-        "_vitality",
-        "_protection",
-        "_intelligence",
-        "_magic_strength",
-        "_mana",
-        "_health",
-        "_action_points",
-        "_modifiers",
-        "_modifiers_calculated",
-    )
+    __slots__ = ("_player_equipment", "_player_level", "_values")
 
     def __init__(self, equipment: PlayerEquipmnent, level: int):
         self._player_equipment = equipment
         self._player_level = level
 
-        # main stats
-        self._will: Optional[int] = None
-        self._agility: Optional[int] = None
-        self._strength: Optional[int] = None
-        self._vitality: Optional[int] = None
-        self._protection: Optional[int] = None
-        self._intelligence: Optional[int] = None
-        self._magic_strength: Optional[int] = None
-
-        # secondary stats
-        self._mana: Optional[int] = None
-        self._health: Optional[int] = None
-        self._action_points: Optional[int] = None
-
-        self._modifiers = {
-            "will": 0,
-            "agility": 0,
-            "strength": 0,
-            "vitality": 0,
-            "protection": 0,
-            "intelligence": 0,
-            "magic_strength": 0,
-            "mana": 0,
-            "health": 0,
-            "action_points": 0,
-        }
-
-        self._modifiers_calculated = False
-
-    def _calculate_modifiers(self) -> None:
-        if self._modifiers_calculated:
-            return
-
-        for item in self._player_equipment:
-            modifiers = getattr(item, "modifiers", None)
-            if modifiers is None:
-                continue
-
-            for k, v in modifiers.items():
-                self._modifiers[k] += v
+        self._values: Optional[StatsVector] = None
 
-        self._modifiers_calculated = True
-
-    def _calculate_will(self) -> int:
-        self._calculate_modifiers()
-
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["will"]
-        )
-
-    def _calculate_agility(self) -> int:
-        self._calculate_modifiers()
-
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["agility"]
-        )
-
-    def _calculate_strength(self) -> int:
-        self._calculate_modifiers()
-
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["strength"]
-        )
-
-    def _calculate_vitality(self) -> int:
-        self._calculate_modifiers()
-
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["vitality"]
+    def _modifiers(self) -> StatsVector:
+        return sum_vectors(
+            vector
+            for vector in (
+                getattr(item, "modifiers_vector", None)
+                for item in self._player_equipment
+            )
+            if vector is not None
         )
 
-    def _calculate_protection(self) -> int:
-        self._calculate_modifiers()
+    def _get(self, index: int) -> int:
+        if self._values is None:
+            self._values = calculate_stats(self._player_level, self._modifiers())
 
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["protection"]
-        )
-
-    def _calculate_intelligence(self) -> int:
-        self._calculate_modifiers()
-
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["intelligence"]
-        )
+        return self._values[index]
 
-    def _calculate_magic_strength(self) -> int:
-        self._calculate_modifiers()
+    @classmethod
+    def calculate_many(cls, stats: Sequence[PlayerStats]) -> None:
+        """Calculate values of many stats objects at once."""
 
-        return (
-            BASE_STAT_VALUE
-            + LEVEL_TO_STAT_RATIO * self._player_level
-            + self._modifiers["magic_strength"]
+        pending = [s for s in stats if s._values is None]
+        values = calculate_stats_batch(
+            [s._player_level for s in pending], [s._modifiers() for s in pending]
         )
 
-    def _calculate_mana(self) -> int:
-        self._calculate_modifiers()
-
-        return self.intelligence * INTELLIGENCE_TO_MANA_RATIO + self._modifiers["mana"]
-
-    def _calculate_health(self) -> int:
-        self._calculate_modifiers()
-
-        return self.vitality * VITALITY_TO_HEALTH_RATIO + self._modifiers["health"]
-
-    def _calculate_action_points(self) -> int:
-        self._calculate_modifiers()
-
-        return BASE_ACTION_PONTS_VALUE + (
-            int(self.agility * AGILITY_TO_ACTION_POINTS_RATIO)
-            + self._modifiers["action_points"]
-        )
+        for s, v in zip(pending, values):
+            s._values = v
 
     @property
     def will(self) -> int:
-        if self._will is None:
-            self._will = self._calculate_will()
-
-        return self._will
+        return self._get(WILL)
 
     @property
     def agility(self) -> int:
-        if self._agility is None:
-            self._agility = self._calculate_agility()
-
-        return self._agility
+        return self._get(AGILITY)
 
     @property
     def strength(self) -> int:
-        if self._strength is None:
-            self._strength = self._calculate_strength()
-
-        return self._strength
+        return self._get(STRENGTH)
 
     @property
     def vitality(self) -> int:
-        if self._vitality is None:
-            self._vitality = self._calculate_vitality()
-
-        return self._vitality
+        return self._get(VITALITY)
 
     @property
     def protection(self) -> int:
-        if self._protection is None:
-            self._protection = self._calculate_protection()
-
-        return self._protection
+        return self._get(PROTECTION)
 
     @property
     def intelligence(self) -> int:
-        if self._intelligence is None:
-            self._intelligence = self._calculate_intelligence()
-
-        return self._intelligence
+        return self._get(INTELLIGENCE)
 
     @property
     def magic_strength(self) -> int:
-        if self._magic_strength is None:
-            self._magic_strength = self._calculate_magic_strength()
-
-        return self._magic_strength
+        return self._get(MAGIC_STRENGTH)
 
     @property
     def mana(self) -> int:
-        if self._mana is None:
-            self._mana = self._calculate_mana()
-
-        return self._mana
+        return self._get(MANA)
 
     @property
     def health(self) -> int:
-        if self._health is None:
-            self._health = self._calculate_health()
-
-        return self._health
+        return self._get(HEALTH)
 
     @property
     def action_points(self) -> int:
-        if self._action_points is None:
-            self._action_points = self._calculate_action_points()
-
-        return self._action_points
+        return self._get(ACTION_POINTS)
 
     def __repr__(self) -> str:
         return f"<PlayerStats health={self.health} mana={self.mana} action_points={self.action_points}>"
@@ -535,7 +519,8 @@ class Player:
         "race",
         "class_",
         "location",
-        "xp",
+        "_xp",
+        "_level",
         "money",
         "inventory",
         "equipment",
@@ -560,7 +545,8 @@ class Player:
         self.race: Race = Race.from_id(race)
         self.class_: Class = Class.from_id(class_)
         self.location: Location = Location.from_id(location)
-        self.xp = xp
+        self._xp = xp
+        self._level: Optional[int] = None
         self.money = money
         self.inventory = PlayerInventory(items=inventory)
         self.equipment = equipment
@@ -582,6 +568,8 @@ class Player:
         if location_id is None:
             location_id = race_id
 
+        generation = await player_cache.generation(discord_id)
+
         async with pool.acquire() as conn:
             async with conn.transaction():
                 try:
@@ -605,30 +593,78 @@ class Player:
                     discord_id,
                 )
 
-        return cls.from_data(player_data, equipment_data)
+        player = cls.from_data(player_data, equipment_data)
+        await asyncio.gather(
+            player._update_cache(generation), player._update_leaderboard()
+        )
+
+        return player
 
     async def delete(self, conn: asyncpg.Connection) -> None:
         deleted = await conn.fetchrow(
             "DELETE FROM players WHERE discord_id = $1 RETURNING true", self.discord_id
         )
 
+        await asyncio.gather(
+            player_cache.invalidate(self.discord_id),
+            leaderboard.remove(self.discord_id),
+        )
+
         if not deleted:
             raise UnknownPlayer
 
     @classmethod
     async def from_id(cls, discord_id: int, conn: asyncpg.Connection) -> Player:
-        player_data = await conn.fetchrow(
-            "SELECT * FROM players WHERE discord_id = $1", discord_id
-        )
+        snapshot = await player_cache.get(discord_id)
+        if snapshot is not None:
+            return cls.from_data(*snapshot)
+
+        generation = await player_cache.generation(discord_id)
 
-        if player_data is None:
+        data = await conn.fetchrow(SELECT_PLAYER_QUERY, discord_id)
+
+        if data is None:
             raise UnknownPlayer
 
-        equipment_data = await conn.fetchrow(
-            "SELECT * FROM equipment WHERE discord_id = $1", discord_id
+        player = cls.from_data(data, data)
+        await player._update_cache(generation)
+
+        return player
+
+    @classmethod
+    async def from_ids(
+        cls, discord_ids: Iterable[int], conn: asyncpg.Connection
+    ) -> Dict[int, Player]:
+        """
+        Load multiple players in a single query. Returns discord id to player
+        mapping, unknown ids are skipped.
+        """
+
+        ids = set(discord_ids)
+
+        players = {
+            discord_id: cls.from_data(*snapshot)
+            for discord_id, snapshot in (await player_cache.get_many(ids)).items()
+        }
+        missing = [discord_id for discord_id in ids if discord_id not in players]
+
+        if not missing:
+            return players
+
+        generations = await player_cache.generations(missing)
+
+        loaded = [
+            cls.from_data(data, data)
+            for data in await conn.fetch(SELECT_PLAYERS_QUERY, missing)
+        ]
+
+        await asyncio.gather(
+            *(p._update_cache(generations[p.discord_id]) for p in loaded)
         )
 
-        return cls.from_data(player_data, equipment_data)
+        players.update((p.discord_id, p) for p in loaded)
+
+        return players
 
     @classmethod
     def from_data(
@@ -648,11 +684,65 @@ class Player:
             equipment=equipment,
         )
 
+    def to_data(self) -> PlayerSnapshot:
+        """Get player and equipment data in format accepted by from_data."""
+
+        player_data = {
+            "discord_id": self.discord_id,
+            "nick": self.nick,
+            "race": self.race.id,
+            "class": self.class_.id,
+            "location": self.location.id,
+            "xp": self.xp,
+            "money": self.money,
+            "inventory": self.inventory.to_data(),
+        }
+
+        return player_data, self.equipment.to_data()
+
+    async def _update_cache(self, generation: Generation) -> None:
+        """
+        Store snapshot. Only used with data freshly read from Postgres after
+        getting generation.
+        """
+
+        await player_cache.put(self.discord_id, self.to_data(), generation)
+
+    async def _invalidate_cache(self) -> None:
+        """
+        Drop cached snapshot after write. Other Player objects with the same id
+        can be changed concurrently, writing local snapshot could lose their
+        changes. Next read loads player from Postgres.
+        """
+
+        await player_cache.invalidate(self.discord_id)
+
+    async def _update_leaderboard(self) -> None:
+        await leaderboard.update(self.discord_id, self.nick, self.xp, self.money)
+
+    @property
+    def xp(self) -> int:
+        return self._xp
+
+    @xp.setter
+    def xp(self, xp: int) -> None:
+        level = self._level
+
+        self._xp = xp
+        self._level = None
+
+        if self.level != level:
+            # stats depend on level
+            self.stats = PlayerStats(self.equipment, self.level)
+
     @property
     def level(self) -> int:
-        """Get current level."""
+        """Get current level. Cached until xp changes."""
 
-        return xp_to_level(self.xp)
+        if self._level is None:
+            self._level = xp_to_level(self._xp)
+
+        return self._level
 
     @property
     def xp_to_next_level(self) -> int:
@@ -703,6 +793,62 @@ class Player:
         await self.equipment.unequip(item, self, pool)
         return await self.inventory.add(item, self, pool)
 
+    async def transfer_items(
+        self,
+        to: Player,
+        item: Item,
+        count: int,
+        pool: asyncpg.Pool,
+        from_equipment: bool = False,
+    ) -> None:
+        """
+        Transfer items to other player. Changes are made in a single
+        transaction with both players locked.
+
+        Only 1 item can be transferred if from_equipment is set.
+        """
+
+        slot_name = None
+
+        if from_equipment:
+            if count != 1:
+                raise ValueError("Only 1 item can be transferred from equipment")
+
+            if not isinstance(item, Equippable) or item not in self.equipment:
+                await self._invalidate_cache()
+
+                raise ItemNotFound
+
+            slot_name = self.equipment.get_slot_name(item)
+        else:
+            await self.inventory._check_counts(self, {item.id: count})
+
+        try:
+            await pool.execute(
+                INVENTORY_TRANSFER_QUERY,
+                self.discord_id,
+                to.discord_id,
+                item.id,
+                count,
+                slot_name,
+            )
+        except asyncpg.NoDataFoundError:
+            # local data is outdated
+            await self._invalidate_cache()
+
+            raise ItemNotFound
+        except asyncpg.UndefinedObjectError:
+            raise UnknownPlayer
+
+        if slot_name is None:
+            self.inventory._remove(item.id, count)
+        else:
+            setattr(self.equipment, slot_name, None)
+
+        to.inventory._add(item.id, count)
+
+        await asyncio.gather(self._invalidate_cache(), to._invalidate_cache())
+
     def __contains__(self, obj: object) -> bool:
         """Check if item is in player's inventory or equipment."""
 
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import json
+
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Set, Dict, List, Tuple, Iterable, Optional
+from logging import getLogger
+from collections import OrderedDict
+
+from db.redis import REDIS_ERRORS
+
+if TYPE_CHECKING:
+    from db.redis import _ConnectionsPool
+
+log = getLogger(__name__)
+
+# player data, equipment data
+PlayerSnapshot = Tuple[Dict[str, Any], Dict[str, Any]]
+# local generation, redis generation. Redis generation is None if snapshot
+# should not be written to redis
+Generation = Tuple[int, Optional[bytes]]
+
+LOCAL_CACHE_SIZE = 1000
+# other processes do not invalidate local snapshots, they expire instead
+LOCAL_TTL = 30
+REDIS_TTL = 3600  # 1 hour
+
+# snapshot is only stored if player was not invalidated since it was read
+PUT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+"""
+# generation outlives snapshot, reads in progress always see it changed
+INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[1])
+"""
+
+
+class PlayerCache:
+    """
+    Two level cache of player snapshots: in-process LRU and redis.
+
+    Postgres stays the source of truth. Snapshots are only stored after reading
+    from Postgres, player mutation methods invalidate them after write, so the
+    next read loads all changes made by concurrent commands.
+
+    Every invalidation changes player generation. Generation is taken before
+    reading from Postgres and snapshot is not stored if it changed, so reads
+    that overlap with writes do not bring old data back. Local snapshots expire
+    after LOCAL_TTL seconds because writes of other processes only reach redis.
+
+    Redis is optional: while it is unavailable, players are loaded from
+    Postgres. Players whose redis snapshot could not be removed are not read
+    from redis until the next successful write.
+    """
+
+    __slots__ = (
+        "_redis",
+        "_local",
+        "_local_size",
+        "_local_ttl",
+        "_ttl",
+        "_generations",
+        "_redis_stale",
+        "hits",
+        "misses",
+    )
+
+    def __init__(
+        self,
+        *,
+        local_size: int = LOCAL_CACHE_SIZE,
+        local_ttl: float = LOCAL_TTL,
+        ttl: int = REDIS_TTL,
+    ) -> None:
+        self._redis: Optional[_ConnectionsPool] = None
+        # discord id: (expiration time, snapshot)
+        self._local: OrderedDict[int, Tuple[float, PlayerSnapshot]] = OrderedDict()
+        self._local_size = local_size
+        self._local_ttl = local_ttl
+        self._ttl = ttl
+        # discord id: number of local invalidations
+        self._generations: Dict[int, int] = {}
+        self._redis_stale: Set[int] = set()
+
+        self.hits = {"local": 0, "redis": 0}
+        self.misses = 0
+
+    def set_redis(self, redis: _ConnectionsPool) -> None:
+        self._redis = redis
+
+    @staticmethod
+    def _key(discord_id: int) -> str:
+        return f"player:{discord_id}"
+
+    @staticmethod
+    def _generation_key(discord_id: int) -> str:
+        return f"player:{discord_id}:generation"
+
+    def _redis_usable(self, discord_id: int) -> bool:
+        if self._redis is None or self._redis.degraded:
+            return False
+
+        return discord_id not in self._redis_stale
+
+    async def _write_redis(self, discord_id: int, *command: Any) -> None:
+        if self._redis is None:
+            return
+
+        # write is attempted even if redis entry is stale to fix it
+        try:
+            await self._redis.execute(*command)
+        except REDIS_ERRORS as e:
+            log.warning(f"Unable to update cached player {discord_id}: {e!r}")
+
+            self._redis_stale.add(discord_id)
+        else:
+            self._redis_stale.discard(discord_id)
+
+    def _get_local(self, discord_id: int) -> Optional[PlayerSnapshot]:
+        entry = self._local.get(discord_id)
+        if entry is None:
+            return None
+
+        expires, snapshot = entry
+        if expires <= monotonic():
+            del self._local[discord_id]
+
+            return None
+
+        return snapshot
+
+    def _put_local(self, discord_id: int, snapshot: PlayerSnapshot) -> None:
+        self._local[discord_id] = (monotonic() + self._local_ttl, snapshot)
+        self._local.move_to_end(discord_id)
+
+        if len(self._local) > self._local_size:
+            self._local.popitem(last=False)
+
+    async def get(self, discord_id: int) -> Optional[PlayerSnapshot]:
+        snapshot = self._get_local(discord_id)
+        if snapshot is not None:
+            self._local.move_to_end(discord_id)
+            self.hits["local"] += 1
+
+            return snapshot
+
+        if self._redis is not None and self._redis_usable(discord_id):
+            try:
+                data = await self._redis.execute("GET", self._key(discord_id))
+            except REDIS_ERRORS as e:
+                log.debug(f"Unable to get cached player {discord_id}: {e!r}")
+
+                data = None
+
+            if data is not None:
+                player_data, equipment_data = json.loads(data)
+                snapshot = (player_data, equipment_data)
+
+                self._put_local(discord_id, snapshot)
+                self.hits["redis"] += 1
+
+                return snapshot
+
+        self.misses += 1
+
+        return None
+
+    async def get_many(self, discord_ids: Iterable[int]) -> Dict[int, PlayerSnapshot]:
+        """
+        Get cached snapshots of multiple players. Local cache is checked first,
+        the rest is requested from redis with a single MGET. Missing ids are
+        skipped.
+        """
+
+        snapshots: Dict[int, PlayerSnapshot] = {}
+        remote: List[int] = []
+
+        for discord_id in discord_ids:
+            snapshot = self._get_local(discord_id)
+            if snapshot is not None:
+                self._local.move_to_end(discord_id)
+                self.hits["local"] += 1
+
+                snapshots[discord_id] = snapshot
+            elif self._redis_usable(discord_id):
+                remote.append(discord_id)
+            else:
+                self.misses += 1
+
+        if not remote:
+            return snapshots
+
+        assert self._redis is not None
+
+        try:
+            values = await self._redis.execute(
+                "MGET", *(self._key(discord_id) for discord_id in remote)
+            )
+        except REDIS_ERRORS as e:
+            log.debug(f"Unable to get {len(remote)} cached players: {e!r}")
+
+            values = [None] * len(remote)
+
+        for discord_id, data in zip(remote, values):
+            if data is None:
+                self.misses += 1
+
+                continue
+
+            player_data, equipment_data = json.loads(data)
+            snapshot = (player_data, equipment_data)
+
+            self._put_local(discord_id, snapshot)
+            self.hits["redis"] += 1
+
+            snapshots[discord_id] = snapshot
+
+        return snapshots
+
+    async def generation(self, discord_id: int) -> Generation:
+        """Get generation of player. Should be called before reading Postgres."""
+
+        return (await self.generations((discord_id,)))[discord_id]
+
+    async def generations(self, discord_ids: Iterable[int]) -> Dict[int, Generation]:
+        """Get generations of multiple players with a single MGET."""
+
+        local = {i: self._generations.get(i, 0) for i in discord_ids}
+        remote = [i for i in local if self._redis_usable(i)]
+
+        values: List[Optional[bytes]] = [None] * len(remote)
+        if remote:
+            assert self._redis is not None
+
+            try:
+                values = [
+                    b"0" if value is None else value
+                    for value in await self._redis.execute(
+                        "MGET", *(self._generation_key(i) for i in remote)
+                    )
+                ]
+            except REDIS_ERRORS as e:
+                log.debug(f"Unable to get generations of {len(remote)} players: {e!r}")
+
+        generations: Dict[int, Generation] = {i: (g, None) for i, g in local.items()}
+        generations.update((i, (local[i], value)) for i, value in zip(remote, values))
+
+        return generations
+
+    async def put(
+        self, discord_id: int, snapshot: PlayerSnapshot, generation: Generation
+    ) -> None:
+        """Store snapshot read after getting generation, unless it changed."""
+
+        local_generation, redis_generation = generation
+
+        if self._generations.get(discord_id, 0) != local_generation:
+            return
+
+        self._put_local(discord_id, snapshot)
+
+        if redis_generation is None:
+            return
+
+        await self._write_redis(
+            discord_id,
+            "EVAL",
+            PUT_SCRIPT,
+            2,
+            self._key(discord_id),
+            self._generation_key(discord_id),
+            redis_generation,
+            json.dumps(snapshot),
+            self._ttl,
+        )
+
+    async def invalidate(self, discord_id: int) -> None:
+        self._local.pop(discord_id, None)
+        self._generations[discord_id] = self._generations.get(discord_id, 0) + 1
+
+        await self._write_redis(
+            discord_id,
+            "EVAL",
+            INVALIDATE_SCRIPT,
+            2,
+            self._key(discord_id),
+            self._generation_key(discord_id),
+            self._ttl * 2,
+        )
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "local_hits": self.hits["local"],
+            "redis_hits": self.hits["redis"],
+            "misses": self.misses,
+            "local_size": len(self._local),
+        }
+
+    def __repr__(self) -> str:
+        return f"<PlayerCache {' '.join(f'{k}={v}' for k, v in self.stats.items())}>"
+
+
+player_cache = PlayerCache()
@@ -2,17 +2,19 @@ from __future__ import annotations
 
 from typing import Any, Dict, List, Type, Tuple, TypeVar, Iterator
 from logging import getLogger
-from contextlib import suppress
-
-from yaml import safe_load
 
 from constants import DATA_DIR
 
+from .snapshot import load_file
+
 log = getLogger("object_loader")
 
 TRPGObject = TypeVar("TRPGObject", bound="RPGObject")
 
-_subclasses: Dict[type, List[Type[RPGObject]]] = {}
+# flattened registry: every class in hierarchy maps to instances of itself and all
+# of its subclasses. per-class _storage_by_id/_storage_by_name point to these dicts
+_registry_by_id: Dict[type, Dict[int, RPGObject]] = {}
+_registry_by_name: Dict[type, Dict[str, RPGObject]] = {}
 
 
 class UnknownObject(Exception):
@@ -23,14 +25,14 @@ class _RPGOBjectMeta(type):
     def __new__(mcls, name: str, bases: Tuple[type, ...], dct: Dict[str, Any]) -> type:
         cls = super().__new__(mcls, name, bases, dct)
 
-        setattr(cls, "_storage_by_id", {})
-        setattr(cls, "_storage_by_name", {})
+        storage_by_id: Dict[int, RPGObject] = {}
+        storage_by_name: Dict[str, RPGObject] = {}
 
-        for base in bases:
-            if base not in _subclasses:
-                _subclasses[base] = []
+        _registry_by_id[cls] = storage_by_id
+        _registry_by_name[cls] = storage_by_name
 
-            _subclasses[base].append(cls)
+        setattr(cls, "_storage_by_id", storage_by_id)
+        setattr(cls, "_storage_by_name", storage_by_name)
 
         return cls
 
@@ -45,8 +47,6 @@ class RPGObject(metaclass=_RPGOBjectMeta):
         self._storage_by_id: Dict[int, TRPGObject]  # type: ignore
         self._storage_by_name: Dict[str, TRPGObject]  # type: ignore
 
-        self._subclasses: List[RPGObject]
-
         self.id: int = kwargs.pop("id")
         self.name: str = kwargs.pop("name")
 
@@ -55,8 +55,40 @@ class RPGObject(metaclass=_RPGOBjectMeta):
                 f"Unknown kwarg(s) passed for {type(self)}: {tuple(kwargs.keys())}"
             )
 
-        self._storage_by_id[self.id] = self
-        self._storage_by_name[self.name.lower()] = self
+        self._register()
+
+    def _register(self) -> None:
+        """Add object to storages of its class and all parent classes."""
+
+        name = self.name.lower()
+
+        for cls in type(self).__mro__:
+            storage_by_id = _registry_by_id.get(cls)
+            if storage_by_id is None:  # not an RPGObject subclass
+                continue
+
+            storage_by_id[self.id] = self
+            _registry_by_name[cls][name] = self
+
+    def _unregister(self) -> None:
+        """
+        Remove object from storages of its class and all parent classes.
+        Entries already replaced by other objects are left untouched.
+        """
+
+        name = self.name.lower()
+
+        for cls in type(self).__mro__:
+            storage_by_id = _registry_by_id.get(cls)
+            if storage_by_id is None:  # not an RPGObject subclass
+                continue
+
+            if storage_by_id.get(self.id) is self:
+                del storage_by_id[self.id]
+
+            storage_by_name = _registry_by_name[cls]
+            if storage_by_name.get(name) is self:
+                del storage_by_name[name]
 
     @classmethod
     def from_data(cls: Type[TRPGObject], data: Dict[str, Any]) -> TRPGObject:
@@ -64,14 +96,12 @@ class RPGObject(metaclass=_RPGOBjectMeta):
 
     @staticmethod
     def _read_objects_from_file(cls: Type[TRPGObject]) -> Dict[int, Any]:
-        with open(
-            f"{DATA_DIR}/rpg/{cls.config_folder}{cls.config_filename}", encoding="utf8"
-        ) as f:
-            data = safe_load(f)
+        data = load_file(f"{DATA_DIR}/rpg/{cls.config_folder}{cls.config_filename}")
 
         if data is None:  # empty config
             return {}
 
+        # snapshot loader returns new object on each call, it can be modified
         for k, v in data.items():
             v["id"] = k
 
@@ -96,49 +126,29 @@ class RPGObject(metaclass=_RPGOBjectMeta):
     def _drop_objects(cls: Type[RPGObject]) -> None:
         log.debug(f"Dropping {cls.__name__} objects")
 
-        cls._storage_by_id = {}
-        cls._storage_by_name = {}
+        # storages are shared with parent and child classes, objects should be
+        # removed from all of them instead of rebinding attributes
+        objects: List[RPGObject] = list(cls._storage_by_id.values())
+        for obj in objects:
+            obj._unregister()
 
     @classmethod
     def from_id(cls, id: int) -> TRPGObject:
-        subclasses = _subclasses.get(cls)
-        if subclasses is None:
-            try:
-                return cls._storage_by_id[id]
-            except KeyError:
-                raise UnknownObject
-
-        for subclass in subclasses:
-            with suppress(UnknownObject):
-                return subclass.from_id(id)
-
-        raise UnknownObject
+        try:
+            return cls._storage_by_id[id]
+        except KeyError:
+            raise UnknownObject
 
     @classmethod
     def from_name(cls, name: str) -> TRPGObject:
-        subclasses = _subclasses.get(cls)
-        if subclasses is None:
-            try:
-                return cls._storage_by_name[name]
-            except KeyError:
-                raise UnknownObject
-
-        for subclass in subclasses:
-            with suppress(UnknownObject):
-                return subclass.from_name(name)
-
-        raise UnknownObject
+        try:
+            return cls._storage_by_name[name]
+        except KeyError:
+            raise UnknownObject
 
     @classmethod
     def all_instances(cls) -> Iterator[RPGObject]:
-        subclasses = _subclasses.get(cls)
-        if subclasses is None:
-            yield from cls._storage_by_id.values()
-
-            return
-
-        for subclass in subclasses:
-            yield from subclass.all_instances()
+        yield from cls._storage_by_id.values()
 
     def __str__(self) -> str:
         return f"{self.name}[{self.id}]"
@@ -0,0 +1,161 @@
+"""
+Binary snapshot of game data files.
+
+Parsing YAML is slow, so parsed contents of files under data/rpg are stored in
+a single marshal file. Entries are validated against file size, mtime and hash
+before use, stale or missing entries are read from YAML and written back on
+next save.
+"""
+
+import os
+import hashlib
+import marshal
+
+from typing import Any, Dict, Tuple, Optional
+from logging import getLogger
+
+from constants import DATA_DIR
+from utils.yaml_loader import load
+
+# bump this when snapshot layout changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = os.sep.join((DATA_DIR, "rpg.snapshot"))
+
+log = getLogger(__name__)
+
+# path: (mtime_ns, size, sha1 hexdigest, marshalled data)
+_EntryType = Tuple[int, int, str, bytes]
+
+_entries: Optional[Dict[str, _EntryType]] = None
+_dirty = False
+
+
+def _file_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+def _load_entries() -> Dict[str, _EntryType]:
+    global _entries
+
+    if _entries is not None:
+        return _entries
+
+    _entries = {}
+
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            version, marshal_version, entries = marshal.load(f)
+    except FileNotFoundError:
+        return _entries
+    except (EOFError, ValueError, TypeError) as e:
+        log.warning(f"Unable to read snapshot {SNAPSHOT_PATH}: {e}")
+
+        return _entries
+
+    if (version, marshal_version) != (SNAPSHOT_VERSION, marshal.version):
+        log.info("Snapshot version mismatch, ignoring it")
+
+        return _entries
+
+    _entries = entries
+
+    return _entries
+
+
+def _parse_and_store(path: str, key: str, stat: os.stat_result) -> Any:
+    global _dirty
+
+    with open(path, "rb") as f:
+        content = f.read()
+
+    data = load(content)
+
+    try:
+        payload = marshal.dumps(data)
+    except ValueError:
+        log.warning(f"Unable to store {key} in snapshot: unsupported data types")
+
+        return data
+
+    _load_entries()[key] = (
+        stat.st_mtime_ns,
+        stat.st_size,
+        _file_hash(content),
+        payload,
+    )
+    _dirty = True
+
+    return data
+
+
+def load_file(path: str) -> Any:
+    """
+    Get parsed contents of data file. Uses snapshot if it is fresh, otherwise
+    falls back to YAML.
+
+    New object is returned on each call, it is safe to modify result.
+    """
+
+    global _dirty
+
+    key = os.path.relpath(path, DATA_DIR)
+    stat = os.stat(path)
+
+    entry = _load_entries().get(key)
+    if entry is None:
+        log.debug(f"{key} is missing from snapshot")
+
+        return _parse_and_store(path, key, stat)
+
+    mtime_ns, size, file_hash, payload = entry
+
+    if size != stat.st_size:
+        return _parse_and_store(path, key, stat)
+
+    if mtime_ns != stat.st_mtime_ns:
+        # mtime changes on checkouts, compare content before reparsing
+        with open(path, "rb") as f:
+            if _file_hash(f.read()) != file_hash:
+                return _parse_and_store(path, key, stat)
+
+        _load_entries()[key] = (stat.st_mtime_ns, size, file_hash, payload)
+        _dirty = True
+
+    return marshal.loads(payload)
+
+
+def save_snapshot(force: bool = False) -> None:
+    """Write snapshot to disk if it was updated."""
+
+    global _dirty
+
+    if not (_dirty or force):
+        return
+
+    entries = _load_entries()
+    tmp_path = f"{SNAPSHOT_PATH}.tmp"
+
+    try:
+        with open(tmp_path, "wb") as f:
+            marshal.dump((SNAPSHOT_VERSION, marshal.version, entries), f)
+
+        os.replace(tmp_path, SNAPSHOT_PATH)
+    except OSError as e:
+        log.warning(f"Unable to write snapshot {SNAPSHOT_PATH}: {e}")
+
+        return
+
+    _dirty = False
+
+    log.debug(f"Saved snapshot with {len(entries)} files")
+
+
+def compile_snapshot() -> None:
+    """Read all data files and write fresh snapshot."""
+
+    for path, dirs, files in os.walk(os.sep.join((DATA_DIR, "rpg"))):
+        for f in files:
+            if f.endswith(".yaml"):
+                load_file(os.sep.join((path, f)))
+
+    save_snapshot(force=True)
@@ -0,0 +1,134 @@
+"""
+Player stat formulas.
+
+Stats are stored in vectors: tuples with one value per stat in STAT_NAMES order.
+Item modifiers are converted to vectors once, when items are loaded.
+"""
+
+from typing import Dict, List, Tuple, Iterable, Sequence
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, batches are calculated in Python
+    numpy = None  # type: ignore
+
+BASE_STAT_VALUE = 10
+BASE_ACTION_PONTS_VALUE = 4
+
+LEVEL_TO_STAT_RATIO = 15
+
+VITALITY_TO_HEALTH_RATIO = 20
+INTELLIGENCE_TO_MANA_RATIO = 20
+AGILITY_TO_ACTION_POINTS_RATIO = 0.1
+
+MAIN_STAT_NAMES = (
+    "will",
+    "agility",
+    "strength",
+    "vitality",
+    "protection",
+    "intelligence",
+    "magic_strength",
+)
+SECONDARY_STAT_NAMES = ("mana", "health", "action_points")
+STAT_NAMES = MAIN_STAT_NAMES + SECONDARY_STAT_NAMES
+
+STAT_INDEXES = {name: i for i, name in enumerate(STAT_NAMES)}
+
+(
+    WILL,
+    AGILITY,
+    STRENGTH,
+    VITALITY,
+    PROTECTION,
+    INTELLIGENCE,
+    MAGIC_STRENGTH,
+    MANA,
+    HEALTH,
+    ACTION_POINTS,
+) = range(len(STAT_NAMES))
+
+StatsVector = Tuple[int, ...]
+
+ZERO_VECTOR: StatsVector = (0,) * len(STAT_NAMES)
+
+# below this number of players Python is faster than numpy conversions
+NUMPY_MIN_BATCH_SIZE = 64
+
+
+def modifiers_vector(modifiers: Dict[str, int]) -> StatsVector:
+    """Convert modifiers mapping to vector. Raises KeyError on unknown stat."""
+
+    vector = [0] * len(STAT_NAMES)
+    for name, value in modifiers.items():
+        vector[STAT_INDEXES[name]] += value
+
+    return tuple(vector)
+
+
+def sum_vectors(vectors: Iterable[StatsVector]) -> StatsVector:
+    result = ZERO_VECTOR
+    for vector in vectors:
+        result = tuple(map(sum, zip(result, vector)))
+
+    return result
+
+
+def calculate_stats(level: int, modifiers: StatsVector) -> StatsVector:
+    """Calculate stats of single player from level and summed modifiers."""
+
+    main_base = BASE_STAT_VALUE + LEVEL_TO_STAT_RATIO * level
+
+    stats = [main_base + modifiers[i] for i in range(len(MAIN_STAT_NAMES))]
+
+    stats.append(stats[INTELLIGENCE] * INTELLIGENCE_TO_MANA_RATIO + modifiers[MANA])
+    stats.append(stats[VITALITY] * VITALITY_TO_HEALTH_RATIO + modifiers[HEALTH])
+    stats.append(
+        BASE_ACTION_PONTS_VALUE
+        + (
+            int(stats[AGILITY] * AGILITY_TO_ACTION_POINTS_RATIO)
+            + modifiers[ACTION_POINTS]
+        )
+    )
+
+    return tuple(stats)
+
+
+def _calculate_stats_numpy(
+    levels: Sequence[int], modifiers: Sequence[StatsVector]
+) -> List[StatsVector]:
+    mods = numpy.array(modifiers, dtype=numpy.int64).reshape(-1, len(STAT_NAMES))
+    main_base = BASE_STAT_VALUE + LEVEL_TO_STAT_RATIO * numpy.array(
+        levels, dtype=numpy.int64
+    )
+
+    stats = numpy.empty_like(mods)
+    stats[:, : len(MAIN_STAT_NAMES)] = (
+        main_base[:, None] + mods[:, : len(MAIN_STAT_NAMES)]
+    )
+
+    stats[:, MANA] = stats[:, INTELLIGENCE] * INTELLIGENCE_TO_MANA_RATIO + mods[:, MANA]
+    stats[:, HEALTH] = stats[:, VITALITY] * VITALITY_TO_HEALTH_RATIO + mods[:, HEALTH]
+    # float64 multiplication and truncation towards zero, same as int() of float
+    stats[:, ACTION_POINTS] = BASE_ACTION_PONTS_VALUE + (
+        numpy.trunc(stats[:, AGILITY] * AGILITY_TO_ACTION_POINTS_RATIO).astype(
+            numpy.int64
+        )
+        + mods[:, ACTION_POINTS]
+    )
+
+    return [tuple(row) for row in stats.tolist()]
+
+
+def calculate_stats_batch(
+    levels: Sequence[int], modifiers: Sequence[StatsVector]
+) -> List[StatsVector]:
+    """
+    Calculate stats of many players. Uses numpy for large batches if it is
+    installed, results are the same as from calculate_stats.
+    """
+
+    if numpy is not None and len(levels) >= NUMPY_MIN_BATCH_SIZE:
+        return _calculate_stats_numpy(levels, modifiers)
+
+    return [calculate_stats(*args) for args in zip(levels, modifiers)]
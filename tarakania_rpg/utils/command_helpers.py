@@ -9,6 +9,6 @@ async def get_author_player(
     """Return player object of message author."""
 
     try:
-        return await Player.from_id(ctx.author.id, ctx.bot.pg)
+        return await ctx.get_player(ctx.author.id)
     except UnknownPlayer:
         raise StopCommandExecution(error_text)
@@ -150,6 +150,9 @@ async def request_confirmation(
     if user is None:
         user = ctx.author
 
+    # other commands should not wait for user answer
+    await ctx.release_slots()
+
     permissions = message.channel.permissions_for(ctx.me)
 
     if permissions.read_message_history and permissions.add_reactions:
@@ -197,6 +200,9 @@ async def request_phrase_confirmation(
     if user is None:
         user = ctx.author
 
+    # other commands should not wait for user answer
+    await ctx.release_slots()
+
     def check(m: discord.Message) -> bool:
         return all(
             (
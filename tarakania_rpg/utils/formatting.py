@@ -1,4 +1,20 @@
-from typing import Any, List
+from typing import Any, List, Iterable, Iterator, Optional, Sequence
+from itertools import islice
+
+# discord message length limit
+MESSAGE_LENGTH = 2000
+# codeblock without content
+CODEBLOCK_LENGTH = 7
+
+# default limit of column width for sampled widths
+MAX_CELL_WIDTH = 40
+# number of rows used to sample column widths
+WIDTH_SAMPLE_SIZE = 100
+
+ELLIPSIS = "…"
+
+# line breaks inside cells would break table layout
+_CELL_WHITESPACE = str.maketrans("\n\r\t", "   ")
 
 
 def codeblock(string: str, language: str = "") -> str:
@@ -60,3 +76,134 @@ class TabularData:
 
         to_draw.append(sep)
         return "\n".join(to_draw)
+
+
+class TableRenderer:
+    """
+    Renders tables in TabularData format page by page.
+
+    Column widths are chosen before rendering: passed explicitly or sampled
+    from first rows. Longer cells are truncated, so all rows have the same
+    length, number of rows fitting into page is known in advance and pages
+    share column widths.
+    """
+
+    __slots__ = ("_columns", "_widths", "_sep", "_row_format", "_header")
+
+    def __init__(self, columns: Sequence[str], widths: Sequence[int]):
+        if len(columns) != len(widths):
+            raise ValueError("Number of widths should match number of columns")
+
+        if any(w < 1 for w in widths):
+            raise ValueError("Column width should be positive")
+
+        self._columns = [str(c) for c in columns]
+        self._widths = list(widths)
+
+        sep = "+".join("-" * w for w in self._widths)
+        self._sep = f"+{sep}+"
+        self._row_format = f"|{'|'.join(f'{{:^{w}}}' for w in self._widths)}|"
+        self._header = self.render_row(self._columns)
+
+    @classmethod
+    def from_sample(
+        cls,
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Any]],
+        *,
+        max_cell_width: int = MAX_CELL_WIDTH,
+        max_row_length: Optional[int] = None,
+    ) -> "TableRenderer":
+        """
+        Make renderer with widths of columns and first WIDTH_SAMPLE_SIZE rows.
+        Widths are shrunk starting from the widest column until row fits into
+        max_row_length.
+        """
+
+        widths = [len(str(c)) + 2 for c in columns]
+
+        for row in islice(rows, WIDTH_SAMPLE_SIZE):
+            for i, cell in enumerate(row):
+                widths[i] = max(widths[i], len(str(cell)) + 1)
+
+        widths = [min(w, max_cell_width) for w in widths]
+
+        if max_row_length is not None:
+            # borders take 1 character per column plus 1
+            budget = max_row_length - len(widths) - 1
+            if budget < len(widths):
+                raise ValueError("Table has too many columns to fit row length")
+
+            while sum(widths) > budget:
+                widest = max(range(len(widths)), key=widths.__getitem__)
+                widths[widest] -= 1
+
+        return cls(columns, widths)
+
+    @property
+    def row_length(self) -> int:
+        return len(self._sep)
+
+    @staticmethod
+    def max_row_length(max_length: int, rows: int = 1) -> int:
+        """Maximum row length allowing given number of rows per page."""
+
+        # separator, header, separator, rows, separator joined with newlines
+        return (max_length + 1) // (rows + 4) - 1
+
+    def render_row(self, row: Sequence[Any]) -> str:
+        cells = [str(cell) for cell in row]
+
+        for i, width in enumerate(self._widths):
+            cell = cells[i]
+
+            # most cells fit and have no line breaks, they are used as is
+            if len(cell) > width or not cell.isprintable():
+                cell = cell.translate(_CELL_WHITESPACE)
+                if len(cell) > width:
+                    cell = f"{cell[: width - 1]}{ELLIPSIS}"
+
+                cells[i] = cell
+
+        return self._row_format.format(*cells)
+
+    def rows_per_page(self, max_length: int) -> int:
+        """
+        Number of rows fitting into page of max_length characters. Raises
+        ValueError if not even a single row fits.
+        """
+
+        line_length = self.row_length + 1
+        rows = (max_length + 1) // line_length - 4
+        if rows < 1:
+            raise ValueError(f"Table row does not fit into {max_length} characters")
+
+        return rows
+
+    def render_page(self, rows: Iterable[Sequence[Any]]) -> str:
+        lines = [self._sep, self._header, self._sep]
+        lines.extend(self.render_row(row) for row in rows)
+        lines.append(self._sep)
+
+        return "\n".join(lines)
+
+    def pages(
+        self,
+        rows: Iterable[Sequence[Any]],
+        max_length: int = MESSAGE_LENGTH - CODEBLOCK_LENGTH,
+    ) -> Iterator[str]:
+        """
+        Lazily render rows into pages of at most max_length characters. Rows
+        are never split between pages. Default length leaves space for
+        codeblock.
+        """
+
+        rows_per_page = self.rows_per_page(max_length)
+
+        iterator = iter(rows)
+        while True:
+            page_rows = list(islice(iterator, rows_per_page))
+            if not page_rows:
+                return
+
+            yield self.render_page(page_rows)
@@ -0,0 +1,175 @@
+from bisect import insort, bisect_left
+from typing import Set, Dict, List, Tuple, Iterable, Iterator, Optional
+from logging import getLogger
+
+import discord
+
+log = getLogger(__name__)
+
+# nick, name#discriminator, both lowercase
+MemberKeys = Tuple[Optional[str], str]
+
+
+def _member_keys(member: discord.Member) -> MemberKeys:
+    return (
+        None if member.nick is None else member.nick.lower(),
+        f"{member.name.lower()}#{member.discriminator}",
+    )
+
+
+def match_position(keys: MemberKeys, pattern: str) -> int:
+    """Position of pattern in nick, or in name if nick does not contain it."""
+
+    nick, name = keys
+
+    position = -1 if nick is None else nick.find(pattern)
+    if position == -1:
+        position = name.find(pattern)
+
+    return position
+
+
+class MemberIndex:
+    """
+    Lowercase member names of a single guild.
+
+    Keys are kept in sorted list, so members with nick or name starting with
+    pattern are found with binary search.
+    """
+
+    __slots__ = ("_keys", "_sorted")
+
+    def __init__(self, members: Iterable[discord.Member]):
+        self._keys: Dict[int, MemberKeys] = {}
+        # (key, member id)
+        self._sorted: List[Tuple[str, int]] = []
+
+        for member in members:
+            keys = _member_keys(member)
+
+            self._keys[member.id] = keys
+            self._sorted.extend((key, member.id) for key in keys if key is not None)
+
+        self._sorted.sort()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, member_id: int) -> bool:
+        return member_id in self._keys
+
+    def add(self, member: discord.Member) -> None:
+        if member.id in self._keys:
+            self.remove(member.id)
+
+        keys = _member_keys(member)
+
+        self._keys[member.id] = keys
+        for key in keys:
+            if key is not None:
+                insort(self._sorted, (key, member.id))
+
+    def remove(self, member_id: int) -> None:
+        keys = self._keys.pop(member_id, None)
+        if keys is None:
+            return
+
+        for key in keys:
+            if key is None:
+                continue
+
+            i = bisect_left(self._sorted, (key, member_id))
+            if i < len(self._sorted) and self._sorted[i] == (key, member_id):
+                del self._sorted[i]
+
+    def search_prefix(self, pattern: str) -> Iterator[int]:
+        """Ids of members with nick or name starting with pattern."""
+
+        seen: Set[int] = set()
+
+        for i in range(bisect_left(self._sorted, (pattern,)), len(self._sorted)):
+            key, member_id = self._sorted[i]
+            if not key.startswith(pattern):
+                break
+
+            if member_id not in seen:
+                seen.add(member_id)
+
+                yield member_id
+
+    def search(self, pattern: str) -> Iterator[Tuple[int, int]]:
+        """
+        Pairs of member id and match position.
+
+        Only the best position is yielded if any member has it. Otherwise all
+        keys are scanned for substring, this fallback is linear in guild size.
+        """
+
+        found = False
+        for member_id in self.search_prefix(pattern):
+            # nick containing pattern takes precedence over name
+            if match_position(self._keys[member_id], pattern) == 0:
+                found = True
+
+                yield member_id, 0
+
+        if found:
+            return
+
+        for member_id, keys in self._keys.items():
+            position = match_position(keys, pattern)
+            if position != -1:
+                yield member_id, position
+
+
+class MemberIndexes:
+    """
+    Guild member indexes. Index is built on first search in guild and then
+    updated from member events. Index is built again if number of cached guild
+    members changes without events, for example after members are chunked.
+    """
+
+    __slots__ = ("_client", "_indexes")
+
+    def __init__(self, client: discord.Client) -> None:
+        self._client = client
+        self._indexes: Dict[int, MemberIndex] = {}
+
+    def get(self, guild: discord.Guild) -> MemberIndex:
+        # guild.members copies member cache into a new list on every access
+        cached_members = len(guild._members)
+
+        index = self._indexes.get(guild.id)
+        if index is None or len(index) != cached_members:
+            index = self._indexes[guild.id] = MemberIndex(guild.members)
+
+            log.debug(f"Built member index of {guild.id} with {len(index)} members")
+
+        return index
+
+    def add_member(self, member: discord.Member) -> None:
+        index = self._indexes.get(member.guild.id)
+        if index is not None:
+            index.add(member)
+
+    def remove_member(self, member: discord.Member) -> None:
+        index = self._indexes.get(member.guild.id)
+        if index is not None:
+            index.remove(member.id)
+
+    def update_user(self, user: discord.User) -> None:
+        """Reindex user in all guilds after name change."""
+
+        for guild_id, index in self._indexes.items():
+            if user.id not in index:
+                continue
+
+            index.remove(user.id)
+
+            guild = self._client.get_guild(guild_id)
+            member = None if guild is None else guild.get_member(user.id)
+            if member is not None:
+                index.add(member)
+
+    def remove_guild(self, guild: discord.Guild) -> None:
+        self._indexes.pop(guild.id, None)
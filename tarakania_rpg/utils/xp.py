@@ -1,9 +1,190 @@
-import math
+"""
+Level curves.
+
+Curve defines amount of xp required to reach each level. Thresholds of first
+levels are precomputed, level of xp is found with binary search over them
+instead of solving curve formula. Curve used by game is defined in
+data/rpg/xp_curve.yaml.
+"""
+
+from bisect import bisect_right
+from typing import Any, Dict, List, Callable, Optional, Sequence
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, batches are converted in Python
+    numpy = None  # type: ignore
+
+# number of levels with precomputed thresholds. Higher levels are searched
+# using curve formula
+TABLE_LEVELS = 1000
+
+# below this number of values Python is faster than numpy conversions
+NUMPY_MIN_BATCH_SIZE = 64
+
+FormulaType = Callable[[int], int]
+
+
+def _polynomial_formula(data: Dict[str, Any]) -> FormulaType:
+    """xp(level) = sum of coefficients[i] * level ** i"""
+
+    coefficients = [int(c) for c in data["coefficients"]]
+
+    def formula(level: int) -> int:
+        result = 0
+        for coefficient in reversed(coefficients):
+            result = result * level + coefficient
+
+        return result
+
+    return formula
+
+
+def _table_formula(data: Dict[str, Any]) -> FormulaType:
+    """
+    Thresholds listed explicitly. Levels after the last one require the same
+    amount of xp as the last step.
+    """
+
+    thresholds = [int(t) for t in data["thresholds"]]
+    if len(thresholds) < 2:
+        raise ValueError("Table curve should contain at least 2 thresholds")
+
+    last_level = len(thresholds) - 1
+    last_step = thresholds[-1] - thresholds[-2]
+
+    def formula(level: int) -> int:
+        if level <= last_level:
+            return thresholds[level]
+
+        return thresholds[-1] + (level - last_level) * last_step
+
+    return formula
+
+
+# curve type name in game data: function making formula from curve data
+CURVE_TYPES: Dict[str, Callable[[Dict[str, Any]], FormulaType]] = {
+    "polynomial": _polynomial_formula,
+    "table": _table_formula,
+}
+
+# 25 * level * (level + 1)
+DEFAULT_CURVE = {"type": "polynomial", "coefficients": [0, 25, 25]}
+
+
+class XPCurve:
+    """Level to xp conversions of a single curve."""
+
+    __slots__ = ("_formula", "_thresholds", "_thresholds_array")
+
+    def __init__(self, formula: FormulaType, table_levels: int = TABLE_LEVELS):
+        self._formula = formula
+        self._thresholds = [formula(level) for level in range(table_levels + 1)]
+
+        if self._thresholds[0] != 0:
+            raise ValueError("Curve should start at 0 xp")
+
+        for level in range(1, table_levels + 1):
+            if self._thresholds[level] <= self._thresholds[level - 1]:
+                raise ValueError(f"Curve is not increasing at level {level}")
+
+        self._thresholds_array: Optional[Any] = None
+        if numpy is not None:
+            try:
+                self._thresholds_array = numpy.array(
+                    self._thresholds, dtype=numpy.int64
+                )
+            except OverflowError:  # conversions fall back to Python
+                pass
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "XPCurve":
+        curve_type = data.get("type")
+        if curve_type is None:
+            raise ValueError("Curve type is missing")
+
+        make_formula = CURVE_TYPES.get(curve_type)
+        if make_formula is None:
+            raise ValueError(f"Unknown curve type: {curve_type}")
+
+        return cls(make_formula(data))
+
+    def level_to_xp(self, level: int) -> int:
+        """Get amount of xp required to reach level."""
+
+        if level < len(self._thresholds):
+            return self._thresholds[level]
+
+        return self._formula(level)
+
+    def xp_to_level(self, xp: int) -> int:
+        """Get level reached with xp."""
+
+        if xp < self._thresholds[-1]:
+            return max(bisect_right(self._thresholds, xp) - 1, 0)
+
+        return self._search_level(xp)
+
+    def _search_level(self, xp: int) -> int:
+        # exponential search for upper bound, then binary search
+        low = len(self._thresholds) - 1
+        high = low * 2
+        while self._formula(high) <= xp:
+            low, high = high, high * 2
+
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._formula(middle) <= xp:
+                low = middle
+            else:
+                high = middle
+
+        return low
+
+    def xp_to_levels(self, xps: Sequence[int]) -> List[int]:
+        """
+        Get levels of many xp values at once. Uses numpy for large batches if it
+        is installed, results are the same as from xp_to_level.
+        """
+
+        if self._thresholds_array is None or len(xps) < NUMPY_MIN_BATCH_SIZE:
+            return [self.xp_to_level(xp) for xp in xps]
+
+        try:
+            values = numpy.array(xps, dtype=numpy.int64)
+        except OverflowError:
+            return [self.xp_to_level(xp) for xp in xps]
+
+        levels = numpy.searchsorted(self._thresholds_array, values, side="right") - 1
+        result = numpy.maximum(levels, 0).tolist()
+
+        # values past precomputed table
+        for i in numpy.flatnonzero(values >= self._thresholds[-1]).tolist():
+            result[i] = self._search_level(xps[i])
+
+        return result
+
+
+_curve = XPCurve.from_data(DEFAULT_CURVE)
+
+
+def get_curve() -> XPCurve:
+    return _curve
+
+
+def set_curve(curve: XPCurve) -> None:
+    global _curve
+
+    _curve = curve
 
 
 def xp_to_level(xp: int) -> int:
-    return int((math.sqrt(625 + 100 * xp) - 25) / 50)
+    return _curve.xp_to_level(xp)
 
 
 def level_to_xp(level: int) -> int:
-    return 25 * level * (1 + level)
+    return _curve.level_to_xp(level)
+
+
+def xp_to_levels(xps: Sequence[int]) -> List[int]:
+    return _curve.xp_to_levels(xps)
@@ -0,0 +1,49 @@
+import os
+
+from typing import IO, Any, Dict, Tuple, Union
+from logging import getLogger
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # libyaml is not available
+    from yaml import SafeLoader
+
+log = getLogger(__name__)
+
+# path: (mtime_ns, size, document)
+_cache: Dict[str, Tuple[int, int, Any]] = {}
+
+
+def load(stream: Union[str, bytes, IO[Any]]) -> Any:
+    """Parse YAML document using the fastest available safe loader."""
+
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def load_file(path: str) -> Any:
+    """
+    Parse YAML file. Parsed documents are cached until file changes.
+
+    Returned object is shared between calls and must not be modified, callers
+    that need to change it should make a copy.
+    """
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+
+    cached = _cache.get(path)
+    if cached is not None:
+        mtime_ns, size, data = cached
+        if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+            return data
+
+    log.debug(f"Parsing {os.path.relpath(path)}")
+
+    with open(path, "rb") as f:
+        data = load(f)
+
+    _cache[path] = (stat.st_mtime_ns, stat.st_size, data)
+
+    return data